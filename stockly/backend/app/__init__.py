@@ -1,25 +1,61 @@
 from flask import Flask
 from .config import Config
-from .extensions import jwt, db, bcrypt, migrate
-from .routes import auth, dashboard, products, orders, clients, profile
+from .extensions import jwt, db, bcrypt, migrate, password_hasher, compressor, metrics
+from .routes import auth, dashboard, products, orders, clients, profile, analytics, sync, events
+from .routes import metrics as metrics_routes
+from . import identity
+from .stats import reconcile_stats_command
+from .search import ensure_search_index, include_in_migrations, rebuild_search_index_command
+from .backfill import backfill_order_items_command
+from .sales import rebuild_sales_rollups_command
+from .restock import restock_cache, restock_report_command
+from .sync import prune_tombstones_command
+from .events import event_hub
+from .database import tune_sqlite, dispose_on_fork, include_unnamed_constraints
+from .json_provider import json_provider_class
 from flask_cors import CORS
-from dotenv import load_dotenv
-import os
+from werkzeug.middleware.proxy_fix import ProxyFix
 
-# load environment variables from the .env file
-load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
-
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
     app.config.from_object(Config) # load configuration from the Config class
+    if test_config:
+        app.config.update(test_config) # settings of the test suite replace the environment's
+
+    # use the configured JSON encoder for requests and responses
+    app.json = json_provider_class(app.config['JSON_PROVIDER'])(app)
     
     CORS(app) # enable Cross-Origin Resource Sharing (CORS)
+
+    # read the client IP from X-Forwarded-For when running behind trusted proxies
+    if app.config['TRUSTED_PROXIES']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
     
     # initialize extensions
     jwt.init_app(app)
     db.init_app(app)
     bcrypt.init_app(app)
-    migrate.init_app(app, db)
+    password_hasher.init_app(app)
+    # migrations compare every table but the search index, which the app maintains;
+    # SQLite can only alter tables by recreating them, so its migrations run in batch mode
+    sqlite = app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite')
+    migrate.init_app(
+        app, db, render_as_batch=sqlite, include_name=include_in_migrations,
+        include_object=include_unnamed_constraints if sqlite else None,
+    )
+    # metrics first, so the request time they record includes compression
+    metrics.init_app(app)
+    compressor.init_app(app)
+    event_hub.init_app(app)
+
+    # apply the SQLite pragmas before any connection is opened, give forked
+    # worker processes their own connections, index existing databases for
+    # search and time every SQL statement
+    with app.app_context():
+        tune_sqlite(db.engine, app.config)
+        dispose_on_fork(db.engine)
+        ensure_search_index(db.engine)
+        metrics.instrument_engine(db.engine)
     
     # register blueprints for routing
     app.register_blueprint(auth.bp)
@@ -28,11 +64,35 @@ def create_app():
     app.register_blueprint(orders.bp)
     app.register_blueprint(clients.bp)
     app.register_blueprint(profile.bp)
+    app.register_blueprint(analytics.bp)
+    app.register_blueprint(sync.bp)
+    app.register_blueprint(events.bp)
+    app.register_blueprint(metrics_routes.bp)
+
+    # register command line tools
+    app.cli.add_command(reconcile_stats_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(backfill_order_items_command)
+    app.cli.add_command(rebuild_sales_rollups_command)
+    app.cli.add_command(restock_report_command)
+    app.cli.add_command(prune_tombstones_command)
+
+    # bound how long cached dashboard summaries, restock reports, tokens and users may be served
+    dashboard.dashboard_cache.ttl = app.config['DASHBOARD_CACHE_TTL']
+    restock_cache.ttl = app.config['RESTOCK_CACHE_TTL']
+    identity.token_cache.ttl = app.config['TOKEN_CACHE_TTL']
+    identity.user_cache.ttl = app.config['USER_CACHE_TTL']
+    jwt.claims_cache = identity.token_cache
     
-    # recommended by ChatGPT: Use after_request to disable caching for security reasons
+    # responses with an ETag may only be kept by the client itself and must be
+    # revalidated before every use; the others (tokens, profiles, unconditional
+    # reads) are not stored at all
     @app.after_request
     def after_request(response):
-        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+        if response.get_etag()[0]:
+            response.headers["Cache-Control"] = "private, no-cache, must-revalidate"
+        else:
+            response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
         response.headers["Expires"] = 0
         response.headers["Pragma"] = "no-cache"
         return response
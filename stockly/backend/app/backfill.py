@@ -0,0 +1,45 @@
+from flask.cli import with_appcontext
+from .models import Products, OrderItems
+from .extensions import db
+import click
+
+# order lines updated per transaction by the backfill
+BACKFILL_BATCH_SIZE = 10000
+
+# copies the current product details onto order lines written before lines kept
+# their own, one range of line IDs per transaction; lines whose product no longer
+# exists are left as they are; returns the number of lines filled in
+def backfill_order_items(batch_size=BACKFILL_BATCH_SIZE):
+    def product_column(column):
+        return db.select(column).where(Products.product_id == OrderItems.product_id).scalar_subquery()
+
+    last_id = db.session.execute(db.select(db.func.max(OrderItems.order_item_id))).scalar() or 0
+    filled = 0
+    for start in range(0, last_id, batch_size):
+        result = db.session.execute(
+            db.update(OrderItems)
+            .where(
+                OrderItems.order_item_id > start,
+                OrderItems.order_item_id <= start + batch_size,
+                OrderItems.unit_price.is_(None),
+                db.exists().where(Products.product_id == OrderItems.product_id),
+            )
+            .values(
+                unit_price=product_column(Products.price),
+                product_name=product_column(Products.name),
+                product_size=product_column(Products.size),
+                product_color=product_column(Products.color),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        filled += result.rowcount
+    return filled
+
+# command line entry point: flask backfill-order-items [--batch-size N]
+@click.command('backfill-order-items')
+@click.option('--batch-size', type=int, default=BACKFILL_BATCH_SIZE, help='Order lines updated per transaction.')
+@with_appcontext
+def backfill_order_items_command(batch_size):
+    filled = backfill_order_items(batch_size)
+    click.echo(f'{filled} order lines backfilled')
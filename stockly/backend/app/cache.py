@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+from .extensions import db
+from .models import UserStats
+import threading
+import time
+import uuid
+
+# caches that are dropped for a user whenever one of their rows is written
+_write_invalidated_caches = []
+
+# thread-safe in-process cache of values by key
+#
+# entries expire after 'ttl' seconds (if set) and the least recently used entry
+# is evicted once 'maxsize' is reached
+class LRUCache:
+    def __init__(self, ttl=None, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+# LRU cache of values keyed by user ID; with 'invalidate_on_write' a user's entry
+# is dropped whenever a transaction that touched one of their rows commits
+class UserCache(LRUCache):
+    def __init__(self, ttl=None, maxsize=1024, invalidate_on_write=False):
+        super().__init__(ttl, maxsize)
+        if invalidate_on_write:
+            _write_invalidated_caches.append(self)
+
+# records that the current transaction wrote the user's data, for writes made
+# with SQL statements that the flush hooks below cannot see
+def mark_user_written(user_id):
+    db.session.info.setdefault('written_user_ids', set()).add(user_id)
+
+# drops the cached entries of every user whose rows changed in a committed transaction
+def invalidate_user(user_id):
+    for cache in _write_invalidated_caches:
+        cache.invalidate(user_id)
+
+# collects the owners of the rows written in each flush
+@event.listens_for(Session, 'after_flush')
+def _collect_written_users(session, flush_context):
+    written = session.info.setdefault('written_user_ids', set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        user_id = getattr(obj, 'user_id', None)
+        if user_id is not None:
+            written.add(user_id)
+
+# collects the owners of the rows written by insert, update and delete statements
+# run through the session, which the flush never sees: users are read from the
+# statement's parameters and from its 'user_id = ...' criteria; statements that
+# name no user (e.g. bulk updates by primary key) call mark_user_written themselves
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_statement_users(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    statement = orm_execute_state.statement
+    user_id_column = statement.table.c.get('user_id')
+    if user_id_column is None:
+        return
+
+    written = orm_execute_state.session.info.setdefault('written_user_ids', set())
+    parameters = orm_execute_state.parameters
+    if orm_execute_state.is_insert and not parameters:
+        # the values of insert(...).values(...) are bound in the statement itself
+        parameters = statement.compile().params
+    for row in parameters if isinstance(parameters, list) else [parameters or {}]:
+        if row.get('user_id') is not None:
+            written.add(row['user_id'])
+    if not orm_execute_state.is_insert and statement.whereclause is not None:
+        for clause in visitors.iterate(statement.whereclause):
+            if (isinstance(clause, BinaryExpression) and clause.operator is operators.eq
+                    and clause.left.shares_lineage(user_id_column) and isinstance(clause.right, BindParameter)):
+                written.add(clause.right.effective_value)
+
+# gives every user written by the transaction a new data version before it commits
+@event.listens_for(Session, 'before_commit')
+def _bump_data_versions(session):
+    session.flush()
+    user_ids = session.info.get('written_user_ids')
+    if user_ids:
+        session.execute(
+            db.update(UserStats)
+            .where(UserStats.user_id.in_(user_ids))
+            .values(data_version=uuid.uuid4().hex)
+            .execution_options(synchronize_session=False)
+        )
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_written_users(session):
+    for user_id in session.info.pop('written_user_ids', ()):
+        invalidate_user(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_written_users(session):
+    session.info.pop('written_user_ids', None)
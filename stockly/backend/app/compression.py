@@ -0,0 +1,66 @@
+from flask import request
+import gzip
+
+try:
+    import brotli
+except ImportError: # optional dependency, responses are only gzipped without it
+    brotli = None
+
+# content types worth compressing
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/csv', 'text/plain', 'text/html', 'application/x-ndjson'}
+
+# compresses a response body with the best encoding the client accepts
+#
+# small bodies are left alone (the saving would not pay for the CPU time), as are
+# streamed responses such as exports, which are sent while they are produced
+class Compressor:
+    def __init__(self):
+        self.min_size = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 4
+
+    def init_app(self, app):
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.gzip_level = app.config['COMPRESS_GZIP_LEVEL']
+        self.brotli_quality = app.config['COMPRESS_BROTLI_QUALITY']
+        if app.config['COMPRESS_RESPONSES']:
+            app.after_request(self.compress_response)
+
+    def encodings(self):
+        return ['br', 'gzip'] if brotli else ['gzip']
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def compress_response(self, response):
+        if (
+            response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        # the body depends on Accept-Encoding from here on, whether or not it gets compressed
+        response.vary.add('Accept-Encoding')
+
+        encoding = request.accept_encodings.best_match(self.encodings())
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        response.set_data(self.compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+
+        # the compressed bytes differ from the identity ones, so a strong ETag
+        # becomes weak (as nginx does); conditional_get matches both forms
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -1,5 +1,34 @@
 import os
 from datetime import timedelta
+from dotenv import load_dotenv
+
+# load environment variables from the .env file before reading any settings
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+# reads a true/false setting from the environment
+def env_flag(name, default):
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+# URI of the database, defaulting to the SQLite file in the instance folder
+def database_uri():
+    uri = os.getenv('DATABASE_URL', 'sqlite:///stockly.db')
+    # some hosts still hand out the 'postgres://' scheme, which SQLAlchemy no longer accepts
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+# connection pool settings for the SQLAlchemy engine
+def engine_options(uri):
+    options = {
+        'pool_pre_ping': env_flag('DB_POOL_PRE_PING', True),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+    # SQLite connections are cheap and local, the pool size only matters for server databases
+    if not uri.startswith('sqlite'):
+        options['pool_size'] = int(os.getenv('DB_POOL_SIZE', 10))
+        options['max_overflow'] = int(os.getenv('DB_MAX_OVERFLOW', 20))
+        options['pool_timeout'] = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    return options
 
 class Config:
     # secret key for JWT authentication, defaults to 'default_secret_key' if not set
@@ -8,8 +37,107 @@ class Config:
     # token expiration time set to 30 days
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=30)
     
-    # URI for the SQLite database
-    SQLALCHEMY_DATABASE_URI = "sqlite:///stockly.db"
+    # URI for the database (SQLite by default, PostgreSQL via DATABASE_URL)
+    SQLALCHEMY_DATABASE_URI = database_uri()
+
+    # engine and connection pool options
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     
     # disable modification tracking to save resources
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # SQLite tuning applied to every connection: WAL journaling lets readers work
+    # alongside a writer, and busy_timeout makes writers wait instead of failing
+    # with "database is locked"
+    SQLITE_TUNED = env_flag('SQLITE_TUNED', True)
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)) # milliseconds
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -64000)) # negative values are KiB
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)) # bytes
+
+    # seconds a user's dashboard summary may be kept in cache; it is also
+    # discarded as soon as the user's data version changes
+    DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 30))
+
+    # seconds the claims of a verified token, and a user's profile fields, are kept
+    # in memory; profiles are also dropped when the user edits or deletes them
+    TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 300))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))
+
+    # bcrypt work factor for new password hashes; existing hashes made with another
+    # factor are rehashed on the user's next login
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+
+    # threads hashing passwords, and how many more hashes may wait for one
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))
+
+    # login and registration attempts allowed per client IP, and failed logins
+    # allowed per email, within each window (in seconds)
+    LOGIN_RATE_LIMIT_PER_IP = int(os.getenv('LOGIN_RATE_LIMIT_PER_IP', 30))
+    LOGIN_RATE_WINDOW_PER_IP = int(os.getenv('LOGIN_RATE_WINDOW_PER_IP', 60))
+    LOGIN_RATE_LIMIT_PER_EMAIL = int(os.getenv('LOGIN_RATE_LIMIT_PER_EMAIL', 10))
+    LOGIN_RATE_WINDOW_PER_EMAIL = int(os.getenv('LOGIN_RATE_WINDOW_PER_EMAIL', 300))
+
+    # number of reverse proxies in front of the app whose X-Forwarded-For header
+    # is trusted for the client IP (e.g. 1 behind a single load balancer)
+    TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', 0))
+
+    # record per-endpoint latency, SQL and JSON encoding metrics, served at /metrics
+    # to holders of METRICS_TOKEN; off until a token is set, unless METRICS_ENABLED
+    # turns them on for everyone (e.g. on a private network)
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    METRICS_ENABLED = env_flag('METRICS_ENABLED', bool(METRICS_TOKEN))
+
+    # SQL statements taking at least this many milliseconds are logged; 0 turns the log off
+    SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 200))
+
+    # JSON encoder for responses: 'auto' uses orjson when it is installed,
+    # 'orjson' requires it and 'default' always uses the json module
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'auto')
+
+    # demand forecasting for restock recommendations: days of order history read,
+    # smoothing factor of the daily demand (0-1, higher follows recent days more
+    # closely), days between reordering and receiving stock, standard deviations
+    # of demand kept as safety stock, and days of demand a reorder should cover
+    RESTOCK_HISTORY_DAYS = int(os.getenv('RESTOCK_HISTORY_DAYS', 90))
+    RESTOCK_SMOOTHING = float(os.getenv('RESTOCK_SMOOTHING', 0.2))
+    RESTOCK_LEAD_TIME_DAYS = int(os.getenv('RESTOCK_LEAD_TIME_DAYS', 7))
+    RESTOCK_SAFETY_FACTOR = float(os.getenv('RESTOCK_SAFETY_FACTOR', 1.65))
+    RESTOCK_COVER_DAYS = int(os.getenv('RESTOCK_COVER_DAYS', 30))
+
+    # seconds a user's restock report may be kept in cache; it is also discarded
+    # as soon as the user's orders or products change
+    RESTOCK_CACHE_TTL = int(os.getenv('RESTOCK_CACHE_TTL', 3600))
+
+    # delta sync: seconds each sync reaches back before the previous one, to catch
+    # rows written by transactions still open at the time, and days tombstones of
+    # deleted rows are kept (older tokens get a full sync)
+    SYNC_OVERLAP_SECONDS = int(os.getenv('SYNC_OVERLAP_SECONDS', 30))
+    SYNC_TOMBSTONE_DAYS = int(os.getenv('SYNC_TOMBSTONE_DAYS', 90))
+
+    # worker processes serving the app; gunicorn.conf.py sets it to its own count
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))
+
+    # order events streamed at /events: 'memory' publishes within one worker process,
+    # so it is only allowed with a single one, 'database' through a table every
+    # worker polls each EVENTS_POLL_SECONDS (rows are kept for EVENTS_RETENTION_SECONDS,
+    # and read again for EVENTS_POLL_OVERLAP_SECONDS in case they commit late);
+    # each open stream holds a thread, and gunicorn.conf.py gives every process
+    # EVENTS_MAX_STREAMS threads for them on top of GUNICORN_THREADS
+    EVENTS_BACKEND = os.getenv('EVENTS_BACKEND', 'database' if WEB_CONCURRENCY > 1 else 'memory')
+    EVENTS_POLL_SECONDS = float(os.getenv('EVENTS_POLL_SECONDS', 1))
+    EVENTS_POLL_OVERLAP_SECONDS = int(os.getenv('EVENTS_POLL_OVERLAP_SECONDS', 10)) # how late a published row may commit
+    EVENTS_RETENTION_SECONDS = int(os.getenv('EVENTS_RETENTION_SECONDS', 300))
+    EVENTS_MAX_STREAMS = int(os.getenv('EVENTS_MAX_STREAMS', 16))
+    EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 100)) # event batches waiting per stream
+    EVENTS_HEARTBEAT_SECONDS = int(os.getenv('EVENTS_HEARTBEAT_SECONDS', 15))
+    EVENTS_STREAM_SECONDS = int(os.getenv('EVENTS_STREAM_SECONDS', 300))
+    EVENTS_TOKEN_SECONDS = int(os.getenv('EVENTS_TOKEN_SECONDS', 60)) # lifetime of the stream tokens passed in URLs
+
+    # compress responses of at least COMPRESS_MIN_SIZE bytes with brotli (when the
+    # brotli package is installed) or gzip, as negotiated through Accept-Encoding;
+    # turn off when a reverse proxy already compresses
+    COMPRESS_RESPONSES = env_flag('COMPRESS_RESPONSES', True)
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024)) # bytes
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
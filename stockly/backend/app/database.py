@@ -0,0 +1,44 @@
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+import os
+
+# applies the SQLite pragmas from the config to every new connection of the engine
+def tune_sqlite(engine, config):
+    if engine.dialect.name != 'sqlite' or not config['SQLITE_TUNED']:
+        return
+
+    pragmas = [
+        # in-memory databases have no journal to switch
+        None if engine.url.database in (None, '', ':memory:') else 'journal_mode=WAL',
+        'synchronous=NORMAL',
+        f"busy_timeout={config['SQLITE_BUSY_TIMEOUT']}",
+        f"cache_size={config['SQLITE_CACHE_SIZE']}",
+        f"mmap_size={config['SQLITE_MMAP_SIZE']}",
+        'temp_store=MEMORY',
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            if pragma:
+                cursor.execute(f'PRAGMA {pragma}')
+        cursor.close()
+
+# true for the error SQLite raises when a write waited SQLITE_BUSY_TIMEOUT for
+# other writers and still could not start; the request can simply be retried
+def is_database_busy(error):
+    return isinstance(error, OperationalError) and 'database is locked' in str(error.orig)
+
+# drops pooled connections inherited from a parent process (for example when
+# gunicorn preloads the app before forking workers), so each worker opens its own
+def dispose_on_fork(engine):
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+# Alembic filter for SQLite, which cannot drop a constraint by name when it has
+# none, as with the foreign keys db.create_all makes; batch migrations recreate
+# the table instead, so such a key is dropped together with its column rather
+# than with a drop_constraint(None) that fails
+def include_unnamed_constraints(object, name, type_, reflected, compare_to):
+    return not (type_ == 'foreign_key_constraint' and reflected and name is None and compare_to is None)
@@ -0,0 +1,45 @@
+from flask import current_app, g, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from functools import wraps
+from .models import UserStats
+from .extensions import db
+import hashlib
+
+# returns the token that changes whenever any of the user's data is written
+def data_version(user_id):
+    return db.session.execute(
+        db.select(UserStats.data_version).where(UserStats.user_id == user_id)
+    ).scalar()
+
+# answers conditional GETs for a user's data with a strong ETag built from their
+# data version and the request URL, returning 304 without running the view when
+# the client's copy is current
+#
+# 'vary' optionally returns extra values the response depends on (e.g. the month)
+def conditional_get(vary=None):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = get_jwt_identity()
+            version = data_version(user_id)
+            g.data_version = version
+
+            # users without a data version yet are served without an ETag
+            if version is None:
+                return view(*args, **kwargs)
+
+            key = f"{user_id}:{version}:{request.full_path}:{vary() if vary else ''}"
+            etag = hashlib.sha256(key.encode()).hexdigest()[:32]
+
+            # weak comparison, since compressed responses carry the weak form of the tag
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
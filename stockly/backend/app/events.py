@@ -0,0 +1,225 @@
+from .models import StreamEvents
+from .extensions import db
+from collections import defaultdict
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger('stockly.events')
+
+# how long browsers wait before reconnecting a stream that ended
+RECONNECT_MILLISECONDS = 3000
+
+# put in a subscription's queue when it fell too far behind; its stream then
+# asks the client to resync and ends
+RESYNC = object()
+
+# builds an event about one order
+def order_event(name, order_id, **data):
+    return {'event': name, 'data': {'order_id': order_id, **data}}
+
+# formats events as a Server-Sent Events message
+def format_events(events):
+    return ''.join(f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n" for event in events)
+
+# one open stream: a bounded queue of event batches
+class Subscription:
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize)
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def put(self, events):
+        with self._lock:
+            try:
+                self.queue.put_nowait(events)
+            except queue.Full:
+                # the client is not reading fast enough: drop what is waiting
+                # and tell it to fetch the current state instead
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.queue.put_nowait(RESYNC)
+
+# publishes straight to the streams of this process; only for a single worker
+class MemoryBackend:
+    def __init__(self, hub, app):
+        self.hub = hub
+
+    def publish(self, user_id, events):
+        self.hub.deliver(user_id, events)
+
+    def start(self):
+        pass
+
+# publishes through a table that every worker process polls, so streams see the
+# events of all workers; a stand-in for a message broker that only needs the
+# database the app already uses
+#
+# IDs are not a safe cursor: on PostgreSQL they are taken from a sequence before
+# the row commits, so a later ID can become visible first; every poll reads again
+# the rows written in the last EVENTS_POLL_OVERLAP_SECONDS and skips those it
+# already delivered
+class DatabaseBackend:
+    def __init__(self, hub, app):
+        self.hub = hub
+        self.app = app
+        self.poll_seconds = app.config['EVENTS_POLL_SECONDS']
+        self.overlap = timedelta(seconds=app.config['EVENTS_POLL_OVERLAP_SECONDS'])
+        self.retention = timedelta(seconds=app.config['EVENTS_RETENTION_SECONDS'])
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def publish(self, user_id, events):
+        with db.engine.begin() as connection:
+            connection.execute(db.insert(StreamEvents), {'user_id': user_id, 'payload': json.dumps(events)})
+
+    # starts this process's poller on its first stream; forked workers start their own
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            with self.app.app_context():
+                engine = db.engine
+            # events published before the first stream opened are not delivered
+            with engine.connect() as connection:
+                seen = dict(connection.execute(
+                    db.select(StreamEvents.event_id, StreamEvents.created_at)
+                    .where(StreamEvents.created_at >= datetime.utcnow() - self.overlap)
+                ).all())
+            threading.Thread(target=self._poll, args=(engine, seen), name='stockly-events', daemon=True).start()
+
+    # delivers the events published since the previous poll, every EVENTS_POLL_SECONDS;
+    # 'seen' maps the IDs delivered within the overlap to when they were written
+    def _poll(self, engine, seen):
+        pruned = time.monotonic()
+        while True:
+            time.sleep(self.poll_seconds)
+            since = datetime.utcnow() - self.overlap
+            try:
+                with engine.begin() as connection:
+                    rows = connection.execute(
+                        db.select(StreamEvents.event_id, StreamEvents.user_id, StreamEvents.payload, StreamEvents.created_at)
+                        .where(StreamEvents.created_at >= since)
+                        .order_by(StreamEvents.created_at, StreamEvents.event_id)
+                    ).all()
+                    if time.monotonic() - pruned >= self.retention.total_seconds():
+                        connection.execute(
+                            db.delete(StreamEvents).where(StreamEvents.created_at < datetime.utcnow() - self.retention)
+                        )
+                        pruned = time.monotonic()
+            except Exception:
+                logger.exception("reading published events failed")
+                continue
+
+            for event_id, user_id, payload, created_at in rows:
+                if event_id in seen:
+                    continue
+                seen[event_id] = created_at
+                self.hub.deliver(user_id, json.loads(payload))
+            for event_id in [event_id for event_id, created_at in seen.items() if created_at < since]:
+                del seen[event_id]
+
+# backends selectable through EVENTS_BACKEND
+EVENT_BACKENDS = {
+    'memory': MemoryBackend,
+    'database': DatabaseBackend,
+}
+
+# in-process pub/sub of events for /events streams, fanned out per user
+#
+# each stream has a bounded queue, so a slow client cannot hold more than
+# EVENTS_QUEUE_SIZE batches in memory, and receives a heartbeat comment whenever
+# it has been idle for EVENTS_HEARTBEAT_SECONDS, which keeps proxies from closing
+# it and lets the server notice clients that went away; streams end after
+# EVENTS_STREAM_SECONDS and the browser reconnects
+class EventHub:
+    def __init__(self):
+        self.queue_size = 100
+        self.heartbeat_seconds = 15
+        self.stream_seconds = 300
+        self.max_streams = 16
+        self.backend = MemoryBackend(self, None)
+        self._subscriptions = defaultdict(set)
+        self._streams = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.queue_size = app.config['EVENTS_QUEUE_SIZE']
+        self.heartbeat_seconds = app.config['EVENTS_HEARTBEAT_SECONDS']
+        self.stream_seconds = app.config['EVENTS_STREAM_SECONDS']
+        self.max_streams = app.config['EVENTS_MAX_STREAMS']
+        backend = app.config['EVENTS_BACKEND']
+        if backend not in EVENT_BACKENDS:
+            raise RuntimeError(f"Unknown EVENTS_BACKEND {backend!r}, expected one of {', '.join(EVENT_BACKENDS)}")
+        if backend == 'memory' and app.config['WEB_CONCURRENCY'] > 1:
+            # streams would only see the events of the process they run in
+            raise RuntimeError("EVENTS_BACKEND 'memory' needs a single worker process, use 'database' with WEB_CONCURRENCY > 1")
+        self.backend = EVENT_BACKENDS[backend](self, app)
+
+    # publishes events to every stream of the user; called after the change is
+    # committed, and never fails the request that made it
+    def publish(self, user_id, events):
+        if not events:
+            return
+        try:
+            self.backend.publish(user_id, events)
+        except Exception:
+            logger.exception("publishing events for user %s failed", user_id)
+
+    # hands events to the user's streams in this process
+    def deliver(self, user_id, events):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put(events)
+
+    # opens a stream for the user, or returns None if this process has no room for another
+    def subscribe(self, user_id):
+        with self._lock:
+            if self._streams >= self.max_streams:
+                return None
+            self._streams += 1
+            subscription = Subscription(user_id, self.queue_size)
+            self._subscriptions[user_id].add(subscription)
+        self.backend.start()
+        return subscription
+
+    # closes a stream; safe to call more than once
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription.closed:
+                return
+            subscription.closed = True
+            self._streams -= 1
+            subscriptions = self._subscriptions[subscription.user_id]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    # yields the Server-Sent Events messages of a stream until it ends; the
+    # caller unsubscribes once the response is closed
+    def stream(self, subscription):
+        yield f"retry: {RECONNECT_MILLISECONDS}\n\n"
+        ends = time.monotonic() + self.stream_seconds
+        while True:
+            remaining = ends - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                events = subscription.queue.get(timeout=min(self.heartbeat_seconds, remaining))
+            except queue.Empty:
+                yield ": heartbeat\n\n"
+                continue
+            if events is RESYNC:
+                yield format_events([{'event': 'resync', 'data': {}}])
+                return
+            yield format_events(events)
+
+# the hub used by the app
+event_hub = EventHub()
@@ -1,10 +1,13 @@
-from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_migrate import Migrate
+from .passwords import PasswordHasher
+from .tokens import CachingJWTManager
+from .compression import Compressor
+from .metrics import Metrics
 
-# initialize the JWT manager for handling JSON Web Tokens
-jwt = JWTManager()
+# initialize the JWT manager for handling JSON Web Tokens, which caches verified tokens
+jwt = CachingJWTManager()
 
 # initialize the SQLAlchemy database connection and ORM
 db = SQLAlchemy()
@@ -13,4 +16,14 @@ db = SQLAlchemy()
 bcrypt = Bcrypt()
 
 # initialize the Migrate object for handling database migrations
-migrate = Migrate()
\ No newline at end of file
+migrate = Migrate()
+
+# initialize the password hasher that runs bcrypt on a bounded thread pool
+password_hasher = PasswordHasher(bcrypt)
+
+
+# initialize the compressor that gzips (or brotli-compresses) large responses
+compressor = Compressor()
+
+# initialize the request and SQL metrics
+metrics = Metrics()
\ No newline at end of file
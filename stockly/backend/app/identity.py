@@ -0,0 +1,53 @@
+from flask import current_app, jsonify, request
+from .models import Users
+from .extensions import db, jwt
+from .cache import LRUCache, UserCache
+
+# claims of recently verified tokens, keyed by the encoded token
+token_cache = LRUCache(maxsize=4096)
+
+# profile fields of recently seen users, so authenticated requests do not
+# query the users table every time
+user_cache = UserCache(maxsize=4096)
+
+# returns the profile fields kept for a user, or None if the user does not exist
+def load_user_profile(user_id):
+    profile = user_cache.get(user_id)
+    if profile is None:
+        row = db.session.execute(
+            db.select(Users.user_id, Users.name, Users.email, Users.phone_number)
+            .where(Users.user_id == user_id)
+        ).mappings().first()
+        if row is None:
+            return None
+        profile = dict(row)
+        user_cache.set(user_id, profile)
+    return profile
+
+# drops a user's cached profile after it was changed or deleted
+def forget_user(user_id):
+    user_cache.invalidate(user_id)
+
+# resolves the user of each authenticated request once, available to views as
+# flask_jwt_extended.current_user (a dict of profile fields)
+@jwt.user_lookup_loader
+def _user_lookup(jwt_header, jwt_data):
+    return load_user_profile(jwt_data[current_app.config['JWT_IDENTITY_CLAIM']])
+
+# tokens of deleted accounts are refused like invalid ones
+@jwt.user_lookup_error_loader
+def _user_lookup_error(jwt_header, jwt_data):
+    return jsonify(message="User not found"), 401
+
+# value of the 'scope' claim of stream tokens, which only open /events streams
+EVENTS_SCOPE = 'events'
+
+# stream tokens are passed in URLs, so they are short-lived and refused by every
+# other route
+@jwt.token_verification_loader
+def _check_token_scope(jwt_header, jwt_data):
+    return jwt_data.get('scope') != EVENTS_SCOPE or request.endpoint == 'events.events'
+
+@jwt.token_verification_failed_loader
+def _token_scope_error(jwt_header, jwt_data):
+    return jsonify(message="This token can only open event streams"), 401
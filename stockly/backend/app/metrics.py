@@ -0,0 +1,152 @@
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from collections import defaultdict
+import logging
+import threading
+import time
+
+slow_query_logger = logging.getLogger('stockly.slow_queries')
+
+# upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# label used for requests that did not match any route
+UNMATCHED_ENDPOINT = 'unmatched'
+
+# cumulative histogram of observed values, in the Prometheus layout
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+# in-process request and SQL measurements, exposed in the Prometheus text format
+#
+# per request it records the latency, the number of SQL statements, the time spent
+# in SQL and the time spent encoding JSON, labelled by endpoint, so the remainder
+# (view code and marshmallow) can be told apart from the database and the encoder;
+# each worker process keeps its own figures
+class Metrics:
+    def __init__(self):
+        self.slow_query_seconds = 0.2
+        self._lock = threading.Lock()
+        self._latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self._queries = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+        self._requests = defaultdict(int)
+        self._sql_seconds = defaultdict(float)
+        self._json_seconds = defaultdict(float)
+
+    def init_app(self, app):
+        self.slow_query_seconds = app.config['SLOW_QUERY_MS'] / 1000
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+        # times JSON encoding through whichever provider the app uses
+        encode = app.json.response
+
+        def timed_response(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return encode(*args, **kwargs)
+            finally:
+                if has_request_context() and 'metrics_started' in g:
+                    g.metrics_json_seconds += time.perf_counter() - started
+
+        app.json.response = timed_response
+
+    # counts and times every statement run by the engine, logging the slow ones
+    def instrument_engine(self, engine):
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('metrics_query_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info['metrics_query_started'].pop()
+
+            in_request = has_request_context() and 'metrics_started' in g
+            if in_request:
+                g.metrics_queries += 1
+                g.metrics_sql_seconds += elapsed
+
+            if self.slow_query_seconds and elapsed >= self.slow_query_seconds:
+                slow_query_logger.warning(
+                    "slow query (%.1f ms) in %s: %s",
+                    elapsed * 1000,
+                    self._endpoint() if has_request_context() else 'no request',
+                    ' '.join(statement.split())[:1000],
+                )
+
+    def _endpoint(self):
+        return request.endpoint or UNMATCHED_ENDPOINT
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_sql_seconds = 0.0
+        g.metrics_json_seconds = 0.0
+
+    def _finish_request(self, response):
+        if 'metrics_started' not in g:
+            return response
+
+        elapsed = time.perf_counter() - g.metrics_started
+        endpoint = self._endpoint()
+        with self._lock:
+            self._requests[(endpoint, request.method, response.status_code)] += 1
+            self._latency[endpoint].observe(elapsed)
+            self._queries[endpoint].observe(g.metrics_queries)
+            self._sql_seconds[endpoint] += g.metrics_sql_seconds
+            self._json_seconds[endpoint] += g.metrics_json_seconds
+        return response
+
+    # renders every metric in the Prometheus text exposition format
+    def render(self):
+        lines = []
+
+        def header(name, kind, description):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, histograms):
+            for endpoint, histogram in sorted(histograms.items()):
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {histogram.sum}')
+                lines.append(f'{name}_count{{endpoint="{endpoint}"}} {histogram.count}')
+
+        def counter(name, values):
+            for endpoint, value in sorted(values.items()):
+                lines.append(f'{name}{{endpoint="{endpoint}"}} {value}')
+
+        with self._lock:
+            header('stockly_requests_total', 'counter', 'Requests handled, by endpoint, method and status.')
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'stockly_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+            header('stockly_request_duration_seconds', 'histogram', 'Time to handle a request, by endpoint.')
+            histogram('stockly_request_duration_seconds', self._latency)
+
+            header('stockly_request_sql_queries', 'histogram', 'SQL statements run per request, by endpoint.')
+            histogram('stockly_request_sql_queries', self._queries)
+
+            header('stockly_sql_seconds_total', 'counter', 'Time spent running SQL statements, by endpoint.')
+            counter('stockly_sql_seconds_total', self._sql_seconds)
+
+            header('stockly_json_encode_seconds_total', 'counter', 'Time spent encoding JSON responses, by endpoint.')
+            counter('stockly_json_encode_seconds_total', self._json_seconds)
+
+        return '\n'.join(lines) + '\n'
@@ -1,5 +1,8 @@
-from .extensions import db, bcrypt
+from .extensions import db, password_hasher
 from datetime import datetime
+from sqlalchemy.orm import object_session
+from sqlalchemy.orm.attributes import set_committed_value
+import uuid
 
 class Users(db.Model):
     __tablename__ = 'users'
@@ -10,7 +13,7 @@ class Users(db.Model):
     password_hash = db.Column(db.Text, nullable=False)
 
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return password_hasher.check(self.password_hash, password)
     
 class Products(db.Model):
     __tablename__ = 'products'
@@ -25,6 +28,14 @@ class Products(db.Model):
     description = db.Column(db.Text, nullable=True)
     quantity = db.Column(db.Integer, nullable=False, default=0)
     order_items = db.relationship('OrderItems', back_populates='product', cascade='all, delete-orphan')
+    # time of the last write, for delta sync; rows not written since the column
+    # was added have none and are only sent by full syncs
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_products_user_id_product_id', 'user_id', 'product_id'),
+        db.Index('ix_products_user_id_updated_at', 'user_id', 'updated_at'),
+    )
 
 class Clients(db.Model):
     __tablename__ = 'clients'
@@ -34,6 +45,12 @@ class Clients(db.Model):
     name = db.Column(db.String(120), nullable=True)
     phone_number = db.Column(db.String(50), nullable=True)
     email = db.Column(db.String(100), nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_clients_user_id_client_id', 'user_id', 'client_id'),
+        db.Index('ix_clients_user_id_updated_at', 'user_id', 'updated_at'),
+    )
 
 class Orders(db.Model):
     __tablename__ = 'orders'
@@ -46,6 +63,16 @@ class Orders(db.Model):
     status = db.Column(db.String(50), nullable=False, default='pending')
     items = db.relationship('OrderItems', backref='orders', lazy=True)
     total_price = db.Column(db.Float, nullable=False, default=0.0)
+    # also moved forward when the order's items, or the names it is served with, change
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_orders_user_id_order_id', 'user_id', 'order_id'),
+        db.Index('ix_orders_user_id_status', 'user_id', 'status'),
+        db.Index('ix_orders_user_id_date', 'user_id', 'date'),
+        db.Index('ix_orders_user_id_updated_at', 'user_id', 'updated_at'),
+        db.Index('ix_orders_client_id', 'client_id'),
+    )
 
 class OrderItems(db.Model):
     __tablename__ = 'order_items'
@@ -56,17 +83,184 @@ class OrderItems(db.Model):
     user = db.relationship('Users', backref='order_items')
     product = db.relationship('Products', back_populates='order_items')
     quantity = db.Column(db.Integer, nullable=False, default=1)
+    # product details copied when the line is written, so later product edits
+    # do not change past orders or their revenue
+    unit_price = db.Column(db.Float, nullable=True)
+    product_name = db.Column(db.String(120), nullable=True)
+    product_size = db.Column(db.String(20), nullable=True)
+    product_color = db.Column(db.String(50), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_order_items_order_id', 'order_id'),
+        db.Index('ix_order_items_product_id', 'product_id'),
+        db.Index('ix_order_items_user_id', 'user_id'),
+    )
+
+    # the column values that copy a product's details onto a line
+    @staticmethod
+    def details_of(price, name, size, color):
+        return {'unit_price': price, 'product_name': name, 'product_size': size, 'product_color': color}
+
+    # returns the line's (price, name, size, color); lines written before the details
+    # were copied, and not backfilled yet, read them from the product instead
+    def product_details(self):
+        if self.unit_price is None and 'product' not in self.__dict__:
+            _load_line_products(object_session(self))
+        if self.unit_price is None and self.product is not None:
+            return self.product.price, self.product.name, self.product.size, self.product.color
+        return self.unit_price, self.product_name, self.product_size, self.product_color
+
+# loads the products of every line in the session that still reads its details
+# from its product in one query, instead of one lazy load per line
+def _load_line_products(session):
+    if session is None:
+        return
+    lines = [
+        obj for obj in session.identity_map.values()
+        if isinstance(obj, OrderItems) and 'product' not in obj.__dict__
+        and 'unit_price' in obj.__dict__ and obj.unit_price is None
+    ]
+    product_ids = {line.product_id for line in lines}
+    products = {
+        product.product_id: product
+        for product in session.execute(db.select(Products).where(Products.product_id.in_(product_ids))).scalars()
+    } if product_ids else {}
+    for line in lines:
+        set_committed_value(line, 'product', products.get(line.product_id))
 
 class MonthlyRevenue(db.Model):
     __tablename__ = 'monthly_revenue'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'))
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.order_id'))
     user = db.relationship('Users', backref='monthly_revenues')
     year = db.Column(db.Integer, nullable=False)
     month = db.Column(db.Integer, nullable=False)
     revenue = db.Column(db.Numeric, nullable=False)
     
     __table_args__ = (
-        db.UniqueConstraint('year', 'month', name='uq_year_month'),
-    )
\ No newline at end of file
+        db.UniqueConstraint('user_id', 'year', 'month', name='uq_user_year_month'),
+    )
+
+class RevenueEvents(db.Model):
+    __tablename__ = 'revenue_events'
+    event_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    # not a foreign key: ledger entries outlive the orders they refer to
+    order_id = db.Column(db.Integer, nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    amount = db.Column(db.Numeric, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_revenue_events_user_id_order_id', 'user_id', 'order_id'),
+    )
+
+# one row per order line each time an order's sales are booked or reversed
+class SalesEvents(db.Model):
+    __tablename__ = 'sales_events'
+    event_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    # not foreign keys: ledger entries outlive the rows they refer to
+    order_id = db.Column(db.Integer, nullable=False)
+    client_id = db.Column(db.Integer, nullable=True)
+    product_id = db.Column(db.Integer, nullable=True)
+    day = db.Column(db.Date, nullable=False)
+    units = db.Column(db.Integer, nullable=False)
+    revenue = db.Column(db.Numeric, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_sales_events_user_id_order_id', 'user_id', 'order_id'),
+    )
+
+# deleted products, clients and orders, so delta syncs can tell clients what to remove
+class Tombstones(db.Model):
+    __tablename__ = 'tombstones'
+    tombstone_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    entity = db.Column(db.String(20), nullable=False) # 'products', 'clients' or 'orders'
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_tombstones_user_id_deleted_at', 'user_id', 'deleted_at'),
+    )
+
+# events published to /events streams through the database backend, read by
+# every worker process; rows are pruned shortly after they are written
+class StreamEvents(db.Model):
+    __tablename__ = 'stream_events'
+    event_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False) # JSON list of events
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    # the IDs of pruned rows are never handed out again
+    __table_args__ = {'sqlite_autoincrement': True}
+
+# daily rollups of the sales ledger; on SQLite they are stored in primary key
+# order, so a date range of a user's rows is read from one contiguous range
+class DailyRevenue(db.Model):
+    __tablename__ = 'daily_revenue'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric, nullable=False, default=0)
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
+class DailyProductSales(db.Model):
+    __tablename__ = 'daily_product_sales'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric, nullable=False, default=0)
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
+class DailyClientSales(db.Model):
+    __tablename__ = 'daily_client_sales'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    client_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric, nullable=False, default=0)
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
+# monthly rollups of the product and client sales, so reports spanning many
+# months add up one row per month instead of one per day
+class MonthlyProductSales(db.Model):
+    __tablename__ = 'monthly_product_sales'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric, nullable=False, default=0)
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
+class MonthlyClientSales(db.Model):
+    __tablename__ = 'monthly_client_sales'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric, nullable=False, default=0)
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
+class UserStats(db.Model):
+    __tablename__ = 'user_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    user = db.relationship('Users', backref=db.backref('stats', uselist=False, cascade='all, delete-orphan'))
+    total_products = db.Column(db.Integer, nullable=False, default=0)
+    total_stock = db.Column(db.Integer, nullable=False, default=0)
+    pending_orders = db.Column(db.Integer, nullable=False, default=0)
+    total_clients = db.Column(db.Integer, nullable=False, default=0)
+    # random token replaced by every transaction that writes the user's data, used for ETags
+    data_version = db.Column(db.String(32), nullable=False, default=lambda: uuid.uuid4().hex)
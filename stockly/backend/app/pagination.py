@@ -0,0 +1,67 @@
+from flask import jsonify, request
+from datetime import date, datetime, timedelta
+
+# largest page a client can request in a single call
+MAX_PAGE_SIZE = 500
+
+# reads the 'limit' and 'cursor' query parameters, raising ValueError if they are invalid
+def page_args():
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor', type=int)
+
+    if 'limit' in request.args and (limit is None or limit < 1):
+        raise ValueError("limit must be a positive whole number")
+    if 'cursor' in request.args and cursor is None:
+        raise ValueError("Invalid cursor")
+
+    if limit is not None:
+        limit = min(limit, MAX_PAGE_SIZE)
+    return limit, cursor
+
+# reads an ISO date/datetime query parameter, raising ValueError if it is invalid
+def date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date")
+
+# reads the ISO date/datetime query parameter that ends a range, returning the
+# bound and whether it is inclusive: a date without a time covers that whole day,
+# so the range ends before the following midnight
+def date_end_arg(name):
+    value = date_arg(name)
+    if value is None:
+        return None, True
+    try:
+        date.fromisoformat(request.args[name])
+    except ValueError:
+        return value, True
+    return value + timedelta(days=1), False
+
+# applies keyset pagination on the given primary key column and serializes the page
+#
+# without 'limit' or 'cursor' the full list is returned as before; otherwise the
+# response is {"items": [...], "next_cursor": <last key or null>}
+def paginate(query, key, serialize):
+    limit, cursor = page_args()
+
+    query = query.order_by(key)
+    if cursor is not None:
+        query = query.filter(key > cursor)
+
+    if limit is None and cursor is None:
+        return jsonify(serialize(query.all()))
+
+    if limit is None:
+        limit = MAX_PAGE_SIZE
+
+    # fetches one extra row to know whether there is a next page
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = getattr(rows[-1], key.key) if has_more else None
+
+    return jsonify(items=serialize(rows), next_cursor=next_cursor)
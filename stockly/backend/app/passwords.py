@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+# raised when too many password hashes are already queued
+class HasherBusy(Exception):
+    pass
+
+# runs bcrypt hashing and checks on a bounded pool of worker threads
+#
+# bcrypt releases the GIL while it works, so the pool caps how many CPU-heavy
+# hashes run at once without blocking the threads serving other requests; once
+# every worker is busy and the queue is full, new calls fail fast with HasherBusy
+class PasswordHasher:
+    def __init__(self, bcrypt):
+        self.bcrypt = bcrypt
+        self.rounds = 12
+        self.workers = 2
+        self.max_pending = 16
+        self._executor = None
+        self._slots = None
+        self._dummy_hash = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.rounds = app.config['BCRYPT_LOG_ROUNDS']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.max_pending = app.config['PASSWORD_HASH_MAX_PENDING']
+
+    # the pool is created on first use, so worker processes forked from a
+    # preloaded master each get their own threads
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+                self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(self.bcrypt.generate_password_hash, password, self.rounds).decode('utf-8')
+
+    def check(self, password_hash, password):
+        return self._run(self.bcrypt.check_password_hash, password_hash, password)
+
+    # spends the same time as a real check, for logins with an unknown email
+    def check_dummy(self, password):
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash('not a real password')
+        self.check(self._dummy_hash, password)
+        return False
+
+    # tells whether a hash was made with a different work factor than the configured one
+    def needs_rehash(self, password_hash):
+        try:
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
@@ -0,0 +1,120 @@
+from itertools import islice
+import codecs
+import csv
+import io
+import json
+
+# columns exchanged by the product import and export endpoints
+PRODUCT_FIELDS = ['product_id', 'name', 'color', 'size', 'dimensions', 'price', 'description', 'quantity']
+
+# supported formats and their content types
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# rows written per transaction while importing, and read per batch while exporting
+IMPORT_CHUNK_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+
+# works out the format of an upload from the 'format' parameter, the file name or the content type
+def upload_format(request, upload=None):
+    fmt = request.args.get('format')
+    if fmt:
+        return fmt if fmt in FORMATS else None
+
+    filename = (upload.filename or '') if upload else ''
+    for name, content_type in FORMATS.items():
+        if filename.lower().endswith('.' + name):
+            return name
+        if request.mimetype == content_type or (upload and upload.mimetype == content_type):
+            return name
+    return None
+
+# validates an imported row and converts it to product column values, raising ValueError if invalid
+def clean_product_row(raw):
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid row")
+
+    # empty CSV cells count as missing values
+    raw = {key: (None if value == '' else value) for key, value in raw.items()}
+
+    name = raw.get('name')
+    price = raw.get('price')
+    quantity = raw.get('quantity')
+
+    if name is None or price is None or quantity is None:
+        raise ValueError("Product name, price, and quantity are required")
+
+    if not str(quantity).isdigit():
+        raise ValueError("Quantity must be a whole number without letters or symbols")
+
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        raise ValueError("Price must be a number")
+
+    product_id = raw.get('product_id')
+    if product_id is not None:
+        if not str(product_id).isdigit():
+            raise ValueError("Invalid product_id")
+        product_id = int(product_id)
+
+    def text(field):
+        value = raw.get(field)
+        return None if value is None else str(value)
+
+    return {
+        'product_id': product_id,
+        'name': str(name),
+        'color': text('color'),
+        'size': text('size'),
+        'dimensions': text('dimensions'),
+        'price': price,
+        'description': text('description'),
+        'quantity': int(quantity),
+    }
+
+# reads an upload one row at a time, yielding (line number, product values, error message)
+def read_product_rows(stream, fmt):
+    lines = codecs.getreader('utf-8')(stream, errors='replace')
+
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for raw in reader:
+            try:
+                yield reader.line_num, clean_product_row(raw), None
+            except ValueError as e:
+                yield reader.line_num, None, str(e)
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, clean_product_row(json.loads(line)), None
+        except ValueError as e:
+            yield line_number, None, str(e)
+
+# splits an iterable into lists of at most 'size' items
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+# serializes batches of product rows into CSV or NDJSON text
+def export_lines(batches, fmt):
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(PRODUCT_FIELDS)
+        yield buffer.getvalue()
+        for batch in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(batch)
+            yield buffer.getvalue()
+        return
+
+    for batch in batches:
+        yield ''.join(json.dumps(dict(zip(PRODUCT_FIELDS, row))) + '\n' for row in batch)
@@ -0,0 +1,45 @@
+from collections import OrderedDict
+from flask import current_app
+import threading
+import time
+
+# in-memory fixed-window rate limiter keyed by arbitrary strings (IP address, email, ...)
+#
+# the limit and window are read from the app config on each call; at most
+# 'max_keys' keys are tracked, evicting the least recently used ones
+class RateLimiter:
+    def __init__(self, limit_key, window_key, max_keys=10000):
+        self.limit_key = limit_key
+        self.window_key = window_key
+        self.max_keys = max_keys
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    # returns the seconds until the key may try again, or None if it is under the limit
+    def retry_after(self, key):
+        limit = current_app.config[self.limit_key]
+        window = current_app.config[self.window_key]
+        now = time.monotonic()
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None or entry[0] + window <= now or entry[1] < limit:
+                return None
+            return entry[0] + window - now
+
+    # counts one attempt for the key
+    def hit(self, key):
+        window = current_app.config[self.window_key]
+        now = time.monotonic()
+        with self._lock:
+            started, count = self._windows.get(key, (now, 0))
+            if started + window <= now:
+                started, count = now, 0
+            self._windows[key] = (started, count + 1)
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+
+    # forgets the attempts counted for the key
+    def reset(self, key):
+        with self._lock:
+            self._windows.pop(key, None)
@@ -0,0 +1,130 @@
+from flask import current_app
+from flask.cli import with_appcontext
+from .models import Users, Products, Orders, OrderItems
+from .extensions import db
+from .cache import UserCache
+from datetime import datetime, timedelta, timezone
+import click
+import csv
+import sys
+import numpy as np
+
+# per-user cache of restock reports, dropped whenever the user's orders or products change
+restock_cache = UserCache(invalidate_on_write=True)
+
+# days of the short and long moving averages of daily demand
+SHORT_WINDOW = 7
+LONG_WINDOW = 28
+
+# fields of each product's recommendation, in the order the CLI writes them
+REPORT_FIELDS = (
+    'product_id', 'name', 'quantity', 'daily_demand', 'average_7_days', 'average_28_days',
+    'days_of_cover', 'reorder_point', 'suggested_quantity', 'needs_restock',
+)
+
+# units ordered per product and day since 'start', as parallel arrays of product
+# IDs, day offsets (0 is 'start') and units, read in one statement
+def demand_history(user_id, start):
+    day = db.func.date(Orders.date)
+    rows = db.session.execute(
+        db.select(OrderItems.product_id, day, db.func.sum(OrderItems.quantity))
+        .join(Orders, Orders.order_id == OrderItems.order_id)
+        .where(Orders.user_id == user_id, Orders.date >= datetime.combine(start, datetime.min.time()))
+        .group_by(OrderItems.product_id, day)
+    ).all()
+
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    product_ids, order_days, units = zip(*rows)
+    offsets = (np.array(order_days, dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(np.int64)
+    return np.array(product_ids, dtype=np.int64), offsets, np.array(units, dtype=np.int64)
+
+# exponentially smoothed level of each row of a (products x days) matrix, with
+# s_0 = x_0 and s_t = alpha * x_t + (1 - alpha) * s_(t-1), as one matrix product
+def exponential_smoothing(demand, alpha):
+    days = demand.shape[1]
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=float)
+    weights[0] = (1 - alpha) ** (days - 1)
+    return demand @ weights
+
+# sales velocity, days of cover and reorder point of every product of a user,
+# computed over all products at once from their daily demand
+#
+# the reorder point is the demand expected over the lead time plus a safety stock
+# of RESTOCK_SAFETY_FACTOR standard deviations of daily demand; products at or
+# below it need restocking, with enough units suggested to cover the lead time
+# and RESTOCK_COVER_DAYS more
+def restock_report(user_id, today=None):
+    config = current_app.config
+    history_days = config['RESTOCK_HISTORY_DAYS']
+    lead_time = config['RESTOCK_LEAD_TIME_DAYS']
+    today = today or datetime.now(timezone.utc).date()
+    start = today - timedelta(days=history_days - 1)
+
+    products = db.session.execute(
+        db.select(Products.product_id, Products.name, Products.quantity)
+        .where(Products.user_id == user_id)
+        .order_by(Products.product_id)
+    ).all()
+    if not products:
+        return []
+    ids = np.array([product.product_id for product in products], dtype=np.int64)
+    quantities = np.array([product.quantity or 0 for product in products], dtype=float)
+
+    # one row of daily units per product, one column per day of history
+    history_ids, offsets, units = demand_history(user_id, start)
+    rows = np.searchsorted(ids, history_ids)
+    known = (rows < len(ids)) & (ids[np.minimum(rows, len(ids) - 1)] == history_ids) & (offsets < history_days)
+    demand = np.zeros((len(ids), history_days))
+    np.add.at(demand, (rows[known], offsets[known]), units[known])
+
+    average_short = demand[:, -SHORT_WINDOW:].mean(axis=1)
+    average_long = demand[:, -LONG_WINDOW:].mean(axis=1)
+    velocity = exponential_smoothing(demand, config['RESTOCK_SMOOTHING'])
+
+    safety_stock = config['RESTOCK_SAFETY_FACTOR'] * demand.std(axis=1) * np.sqrt(lead_time)
+    reorder_point = np.ceil(velocity * lead_time + safety_stock)
+    selling = velocity > 0
+    days_of_cover = np.divide(quantities, velocity, out=np.full(len(ids), np.inf), where=selling)
+    needs_restock = selling & (quantities <= reorder_point)
+    target = velocity * (lead_time + config['RESTOCK_COVER_DAYS']) + safety_stock
+    suggested = np.where(needs_restock, np.ceil(np.maximum(target - quantities, 0)), 0)
+
+    # least cover first; products that do not sell come last
+    order = np.argsort(days_of_cover, kind='stable')
+    columns = {
+        'product_id': ids[order],
+        'quantity': quantities[order].astype(np.int64),
+        'daily_demand': np.round(velocity[order], 3),
+        'average_7_days': np.round(average_short[order], 3),
+        'average_28_days': np.round(average_long[order], 3),
+        'days_of_cover': np.round(days_of_cover[order], 1),
+        'reorder_point': reorder_point[order].astype(np.int64),
+        'suggested_quantity': suggested[order].astype(np.int64),
+        'needs_restock': needs_restock[order],
+    }
+    columns = {field: values.tolist() for field, values in columns.items()}
+    columns['name'] = [products[index].name for index in order.tolist()]
+    columns['days_of_cover'] = [None if cover == float('inf') else cover for cover in columns['days_of_cover']]
+    return [dict(zip(REPORT_FIELDS, values)) for values in zip(*(columns[field] for field in REPORT_FIELDS))]
+
+# command line entry point: flask restock-report [--user-id ID] [--all]
+#
+# writes the recommendations of one or every user as CSV to standard output
+@click.command('restock-report')
+@click.option('--user-id', type=int, default=None, help='Only report the products of this user.')
+@click.option('--all', 'include_all', is_flag=True, help='Include products that do not need restocking.')
+@with_appcontext
+def restock_report_command(user_id, include_all):
+    if user_id is None:
+        user_ids = db.session.execute(db.select(Users.user_id).order_by(Users.user_id)).scalars().all()
+    else:
+        user_ids = [user_id]
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(('user_id', *REPORT_FIELDS))
+    for user_id in user_ids:
+        for product in restock_report(user_id):
+            if include_all or product['needs_restock']:
+                writer.writerow((user_id, *(product[field] for field in REPORT_FIELDS)))
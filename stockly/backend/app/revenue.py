@@ -0,0 +1,82 @@
+from .models import Orders, OrderItems, Products, MonthlyRevenue, RevenueEvents
+from .extensions import db
+from .cache import mark_user_written
+from .rollups import add_to_rollup
+from .sales import book_order_sales, reverse_order_sales
+from datetime import datetime, timezone
+from decimal import Decimal
+
+# calculates the revenue of an order from the prices copied onto its items; only
+# items written before prices were copied, and not backfilled yet, read the product
+def order_revenue(order_id):
+    current_price = db.select(Products.price).where(Products.product_id == OrderItems.product_id).scalar_subquery()
+    revenue = db.session.execute(
+        db.select(db.func.coalesce(db.func.sum(db.func.coalesce(OrderItems.unit_price, current_price) * OrderItems.quantity), 0))
+        .where(OrderItems.order_id == order_id)
+    ).scalar()
+    return Decimal(str(revenue))
+
+# adds an amount to the user's monthly rollup with one atomic SQL statement
+def _add_to_monthly_revenue(user_id, year, month, amount):
+    add_to_rollup(MonthlyRevenue, ['user_id', 'year', 'month'], [
+        {'user_id': user_id, 'year': year, 'month': month, 'revenue': amount},
+    ])
+
+# appends an event to the revenue ledger and applies it to the monthly rollup
+def record_revenue(user_id, order_id, amount, year, month):
+    if not amount:
+        return
+    db.session.add(RevenueEvents(user_id=user_id, order_id=order_id, year=year, month=month, amount=amount))
+    _add_to_monthly_revenue(user_id, year, month, amount)
+
+# books the revenue of many orders created as completed in the current month,
+# with one ledger insert and one rollup update, along with their daily sales
+def record_order_revenues(user_id, amounts):
+    amounts = [(order_id, amount) for order_id, amount in amounts if amount]
+    if not amounts:
+        return
+
+    now = datetime.now(timezone.utc)
+    db.session.execute(db.insert(RevenueEvents), [
+        {'user_id': user_id, 'order_id': order_id, 'year': now.year, 'month': now.month, 'amount': amount, 'created_at': now}
+        for order_id, amount in amounts
+    ])
+    _add_to_monthly_revenue(user_id, now.year, now.month, sum(amount for _, amount in amounts))
+    book_order_sales(user_id, [order_id for order_id, _ in amounts])
+
+# books the revenue of an order being completed in the current month, and its daily sales
+def book_order_revenue(user_id, order_id):
+    now = datetime.now(timezone.utc)
+    record_revenue(user_id, order_id, order_revenue(order_id), now.year, now.month)
+    book_order_sales(user_id, [order_id])
+
+# reverses whatever revenue and sales are booked for an order, in the months
+# (and on the days) they were booked
+def reverse_order_revenue(user_id, order_id):
+    reverse_order_sales(user_id, order_id)
+
+    booked = db.session.execute(
+        db.select(RevenueEvents.year, RevenueEvents.month, db.func.sum(RevenueEvents.amount))
+        .where(RevenueEvents.user_id == user_id, RevenueEvents.order_id == order_id)
+        .group_by(RevenueEvents.year, RevenueEvents.month)
+    ).all()
+
+    if not booked:
+        # orders completed before the ledger existed: reverse in the current month
+        now = datetime.now(timezone.utc)
+        booked = [(now.year, now.month, order_revenue(order_id))]
+
+    for year, month, amount in booked:
+        record_revenue(user_id, order_id, -Decimal(str(amount)), year, month)
+
+# atomically moves an order from one status to another, returning False if
+# another request changed the status first
+def transition_order_status(user_id, order_id, old_status, new_status):
+    mark_user_written(user_id)
+    result = db.session.execute(
+        db.update(Orders)
+        .where(Orders.order_id == order_id, Orders.user_id == user_id, Orders.status == old_status)
+        .values(status=new_status)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
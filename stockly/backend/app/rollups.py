@@ -0,0 +1,38 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from .extensions import db
+from .cache import mark_user_written
+
+# adds counter deltas to rollup rows, creating the rows that do not exist yet
+#
+# 'rows' are dicts holding the key columns and the amounts to add to the other
+# columns; on SQLite and PostgreSQL every row is applied with one atomic upsert
+def add_to_rollup(model, key_columns, rows):
+    if not rows:
+        return
+    for user_id in {row['user_id'] for row in rows}:
+        mark_user_written(user_id)
+
+    counters = [column for column in rows[0] if column not in key_columns]
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        insert = (sqlite.insert if dialect == 'sqlite' else postgresql.insert)(model)
+        db.session.execute(
+            insert.on_conflict_do_update(
+                index_elements=key_columns,
+                set_={column: getattr(model, column) + getattr(insert.excluded, column) for column in counters},
+            ),
+            rows,
+        )
+        return
+
+    # other databases: in-place update, creating the row if there is none yet
+    for row in rows:
+        result = db.session.execute(
+            db.update(model)
+            .where(*(getattr(model, column) == row[column] for column in key_columns))
+            .values({column: getattr(model, column) + row[column] for column in counters})
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.session.execute(db.insert(model).values(row))
@@ -2,4 +2,4 @@ from flask import Blueprint
 
 bp = Blueprint('main', __name__)
 
-from . import auth, dashboard, products, orders, clients, profile
+from . import auth, dashboard, products, orders, clients, profile, metrics, analytics, sync, events
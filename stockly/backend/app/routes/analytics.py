@@ -0,0 +1,216 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..models import (
+    Products, Clients, DailyRevenue, DailyProductSales, DailyClientSales, MonthlyProductSales, MonthlyClientSales,
+)
+from ..extensions import db
+from ..pagination import date_arg
+from ..etag import conditional_get
+from datetime import date, datetime, timedelta, timezone
+
+# blueprint for sales analytics routes
+bp = Blueprint('analytics', __name__)
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# longest period a single report may cover, in days
+MAX_REPORT_DAYS = 3660
+
+# default and largest number of entries in a top-N report
+DEFAULT_TOP_LIMIT = 10
+MAX_TOP_LIMIT = 100
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+# reads the 'from' and 'to' dates of a report, defaulting to the current year
+# so far; raises ValueError if they are invalid
+def report_range():
+    date_from = date_arg('from')
+    date_to = date_arg('to')
+    date_from = date_from.date() if date_from else _today().replace(month=1, day=1)
+    date_to = date_to.date() if date_to else _today()
+
+    if date_from > date_to:
+        raise ValueError("from must not be after to")
+    if (date_to - date_from).days >= MAX_REPORT_DAYS:
+        raise ValueError(f"Reports can cover at most {MAX_REPORT_DAYS} days")
+    return date_from, date_to
+
+# reads the 'limit' of a top-N report, raising ValueError if it is invalid
+def top_limit():
+    if 'limit' not in request.args:
+        return DEFAULT_TOP_LIMIT
+    limit = request.args.get('limit', type=int)
+    if limit is None or limit < 1:
+        raise ValueError("limit must be a positive whole number")
+    return min(limit, MAX_TOP_LIMIT)
+
+# first day of the period a day falls in
+def period_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday()) # weeks start on Monday
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+# first day of the period after the one starting on 'start'
+def next_period(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+# totals per product or client ('key') over a date range: whole months are read
+# from the monthly rollup and the days before and after them from the daily one
+def sales_totals(daily, monthly, key, count, user_id, date_from, date_to):
+    first_month = period_start(date_from, 'month')
+    if first_month < date_from:
+        first_month = next_period(first_month, 'month')
+    end_month = period_start(date_to + timedelta(days=1), 'month')
+
+    def from_daily(start, end):
+        return (
+            db.select(getattr(daily, key).label(key), getattr(daily, count).label(count), daily.revenue)
+            .where(daily.user_id == user_id, daily.day.between(start, end))
+        )
+
+    if first_month >= end_month:
+        parts = [from_daily(date_from, date_to)]
+    else:
+        last_month = end_month - timedelta(days=1)
+        parts = [
+            from_daily(date_from, first_month - timedelta(days=1)),
+            db.select(getattr(monthly, key).label(key), getattr(monthly, count).label(count), monthly.revenue)
+            .where(
+                monthly.user_id == user_id,
+                monthly.year.between(first_month.year, last_month.year),
+                (monthly.year * 12 + monthly.month).between(
+                    first_month.year * 12 + first_month.month, last_month.year * 12 + last_month.month,
+                ),
+            ),
+            from_daily(end_month, date_to),
+        ]
+    rows = db.union_all(*parts).subquery()
+
+    return (
+        db.select(rows.c[key], db.func.sum(rows.c[count]).label(count), db.func.sum(rows.c.revenue).label('revenue'))
+        .group_by(rows.c[key])
+        .having(db.func.sum(rows.c[count]) > 0)
+    )
+
+def _revenue(value):
+    return float(value or 0)
+
+# route to read revenue and completed orders per day, week or month
+@bp.route('/analytics/revenue', methods=['GET'])
+@jwt_required()
+@conditional_get(vary=lambda: _today().isoformat())
+def revenue():
+    current_user = get_jwt_identity()
+
+    granularity = request.args.get('granularity', 'month')
+    if granularity not in GRANULARITIES:
+        return jsonify(message="granularity must be day, week or month"), 400
+    try:
+        date_from, date_to = report_range()
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    # one rollup row per day with sales, added up per period
+    rows = db.session.execute(
+        db.select(DailyRevenue.day, DailyRevenue.orders, DailyRevenue.revenue)
+        .where(DailyRevenue.user_id == current_user, DailyRevenue.day.between(date_from, date_to))
+    ).all()
+
+    periods = {}
+    start = period_start(date_from, granularity)
+    while start <= date_to:
+        periods[start] = {'start': start.isoformat(), 'orders': 0, 'revenue': 0.0}
+        start = next_period(start, granularity)
+    for day, orders, revenue in rows:
+        period = periods[period_start(day, granularity)]
+        period['orders'] += orders
+        period['revenue'] += _revenue(revenue)
+
+    periods = list(periods.values())
+    return jsonify(
+        granularity=granularity,
+        date_from=date_from.isoformat(),
+        date_to=date_to.isoformat(),
+        periods=periods,
+        total_orders=sum(period['orders'] for period in periods),
+        total_revenue=sum(period['revenue'] for period in periods),
+    ), 200
+
+# route to read the best-selling products by units (default) or revenue
+@bp.route('/analytics/top-products', methods=['GET'])
+@jwt_required()
+@conditional_get(vary=lambda: _today().isoformat())
+def top_products():
+    current_user = get_jwt_identity()
+
+    by = request.args.get('by', 'units')
+    if by not in ('units', 'revenue'):
+        return jsonify(message="by must be units or revenue"), 400
+    try:
+        date_from, date_to = report_range()
+        limit = top_limit()
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    totals = sales_totals(
+        DailyProductSales, MonthlyProductSales, 'product_id', 'units', current_user, date_from, date_to,
+    ).subquery()
+    top = (
+        db.select(totals)
+        .order_by(totals.c[by].desc(), totals.c.product_id)
+        .limit(limit)
+        .subquery()
+    )
+    # names come from the products that still exist
+    rows = db.session.execute(
+        db.select(top.c.product_id, Products.name, top.c.units, top.c.revenue)
+        .outerjoin(Products, Products.product_id == top.c.product_id)
+        .order_by((top.c.units if by == 'units' else top.c.revenue).desc(), top.c.product_id)
+    ).all()
+
+    return jsonify([
+        {'product_id': product_id, 'name': name, 'units': units, 'revenue': _revenue(revenue)}
+        for product_id, name, units, revenue in rows
+    ]), 200
+
+# route to read the clients who spent the most
+@bp.route('/analytics/top-clients', methods=['GET'])
+@jwt_required()
+@conditional_get(vary=lambda: _today().isoformat())
+def top_clients():
+    current_user = get_jwt_identity()
+
+    try:
+        date_from, date_to = report_range()
+        limit = top_limit()
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    totals = sales_totals(
+        DailyClientSales, MonthlyClientSales, 'client_id', 'orders', current_user, date_from, date_to,
+    ).subquery()
+    top = (
+        db.select(totals)
+        .order_by(totals.c.revenue.desc(), totals.c.client_id)
+        .limit(limit)
+        .subquery()
+    )
+    # names come from the clients that still exist
+    rows = db.session.execute(
+        db.select(top.c.client_id, Clients.name, top.c.orders, top.c.revenue)
+        .outerjoin(Clients, Clients.client_id == top.c.client_id)
+        .order_by(top.c.revenue.desc(), top.c.client_id)
+    ).all()
+
+    return jsonify([
+        {'client_id': client_id, 'name': name, 'orders': orders, 'revenue': _revenue(revenue)}
+        for client_id, name, orders, revenue in rows
+    ]), 200
@@ -1,15 +1,40 @@
 from flask import Blueprint, jsonify, request
-from ..models import Users
-from ..extensions import db, bcrypt
+from ..models import Users, UserStats
+from ..extensions import db, password_hasher
+from ..passwords import HasherBusy
+from ..ratelimit import RateLimiter
 from flask_jwt_extended import create_access_token
+import math
 import re
 
 # blueprint for the authentication routes
 bp = Blueprint('auth', __name__)
 
+# limits login and registration attempts per client IP, and failed logins per email
+ip_limiter = RateLimiter('LOGIN_RATE_LIMIT_PER_IP', 'LOGIN_RATE_WINDOW_PER_IP')
+email_limiter = RateLimiter('LOGIN_RATE_LIMIT_PER_EMAIL', 'LOGIN_RATE_WINDOW_PER_EMAIL')
+
+# response for clients that went over a rate limit
+def too_many_attempts(retry_after):
+    response = jsonify(message="Too many attempts, please try again later")
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response, 429
+
+# response for when every password hashing worker is busy
+def hasher_busy():
+    response = jsonify(message="The server is busy, please try again")
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 # route for user registration
 @bp.route('/register', methods=['POST'])
 def register():
+    # limits how often a client can make the server hash a password
+    retry_after = ip_limiter.retry_after(request.remote_addr)
+    if retry_after:
+        return too_many_attempts(retry_after)
+    ip_limiter.hit(request.remote_addr)
+
     data = request.get_json()
     name = data['name']
     email = data['email']
@@ -34,8 +59,12 @@ def register():
         return jsonify(message="Passwords do not match"), 400
     
     # hash the password before storing it in the database
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+    try:
+        hashed_password = password_hasher.hash(password)
+    except HasherBusy:
+        return hasher_busy()
     new_user = Users(name=name, email=email, password_hash=hashed_password)
+    new_user.stats = UserStats() # starts the user's dashboard counters at zero
 
     # add the new user to the database and commit the changes
     db.session.add(new_user)
@@ -54,13 +83,35 @@ def login():
 
     email = data['email']
     password = data['password']
+    email_key = str(email).strip().lower()
 
-    # check if the user exists and verify the password
+    # refuses clients and accounts with too many recent attempts before doing any hashing
+    retry_after = ip_limiter.retry_after(request.remote_addr) or email_limiter.retry_after(email_key)
+    if retry_after:
+        return too_many_attempts(retry_after)
+    ip_limiter.hit(request.remote_addr)
+
+    # check if the user exists and verify the password; unknown emails are checked
+    # against a dummy hash so both cases take the same time
     user = Users.query.filter_by(email=email).first()
-    if user and user.check_password(password):
+    try:
+        valid = user.check_password(password) if user else password_hasher.check_dummy(password)
+
+        if valid:
+            email_limiter.reset(email_key)
+
+            # rehash the password if the configured work factor changed since it was stored
+            if password_hasher.needs_rehash(user.password_hash):
+                user.password_hash = password_hasher.hash(password)
+                db.session.commit()
+    except HasherBusy:
+        return hasher_busy()
+
+    if valid:
         # create a JWT token upon successful login
         access_token = create_access_token(identity=user.user_id)
         return jsonify(message="Login successful", access_token=access_token, user_id=user.user_id), 200
     
     # return an error if the credentials are incorrect
+    email_limiter.hit(email_key)
     return jsonify(message="Incorrect email or password"), 401
@@ -1,8 +1,13 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models import Clients
+from ..models import Clients, Orders
 from ..extensions import db
 from ..schemas import ClientSchema
+from ..pagination import paginate
+from ..etag import conditional_get
+from ..stats import bump_user_stats
+from ..search import index_records, unindex_records, search_page
+from ..sync import record_deletions, touch_orders
 
 # define the blueprint for client routes
 bp = Blueprint('clients', __name__)
@@ -10,17 +15,37 @@ bp = Blueprint('clients', __name__)
 # route to access clients list
 @bp.route('/clients', methods=['GET'])
 @jwt_required() # requires authentication
+@conditional_get()
 def clients():
     current_user = get_jwt_identity() # gets the current user's ID from the token
 
-    # queries all clients linked to the current user
-    clients = Clients.query.filter_by(user_id=current_user).all()
+    # queries the clients linked to the current user
+    query = Clients.query.filter_by(user_id=current_user)
 
-    # serializes the client data into JSON format
+    # optional filter by name prefix
+    name = request.args.get('name')
+    if name:
+        query = query.filter(Clients.name.startswith(name, autoescape=True))
+
+    # serializes the client data into JSON format, one page at a time if requested
     client_schema = ClientSchema(many=True)
-    result = client_schema.dump(clients)
-    
-    return jsonify(result)
+    try:
+        return paginate(query, Clients.client_id, client_schema.dump)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+# route to search clients by name, email and phone number, best matches first
+@bp.route('/clients/search', methods=['GET'])
+@jwt_required()
+@conditional_get()
+def search_clients():
+    current_user = get_jwt_identity()
+
+    client_schema = ClientSchema(many=True)
+    try:
+        return search_page('clients', current_user, client_schema.dump)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
 
 # route to client registration with a POST request
 @bp.route('/clients/register-client', methods=['POST'])
@@ -48,6 +73,9 @@ def register_client():
 
     # adds and commits the new client to the database
     db.session.add(new_client)
+    db.session.flush() # assigns the client ID used by the search index
+    index_records('clients', [new_client])
+    bump_user_stats(current_user, clients=1)
     db.session.commit()
 
     return jsonify(message="The client has been registered"), 201
@@ -76,6 +104,10 @@ def update_client(client_id):
     # handles the PUT method to update client details
     data = request.get_json()
 
+    # the client's orders are served with its name
+    if data.get('name', client.name) != client.name:
+        touch_orders(current_user, Orders.client_id == client_id)
+
     client.name = data.get('name', client.name)
     client.phone_number = data.get('phone_number', client.phone_number)
     client.email = data.get('email', client.email)
@@ -84,6 +116,7 @@ def update_client(client_id):
     if not client.name:
         return jsonify(message="Please enter the client's name"), 400
 
+    index_records('clients', [client])
     db.session.commit()
 
     return jsonify(message="Client details updated successfully"), 200
@@ -101,6 +134,9 @@ def delete_client(client_id):
 
     try:
         db.session.delete(client)
+        unindex_records('clients', [client_id])
+        record_deletions(current_user, 'clients', [client_id])
+        bump_user_stats(current_user, clients=-1)
         db.session.commit()
     except Exception as e:
         # rolls back the transaction if deletion fails
@@ -1,60 +1,87 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, g, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models import Products, Orders, Clients, OrderItems, MonthlyRevenue, Users
+from ..models import MonthlyRevenue, UserStats
 from ..extensions import db
+from ..cache import UserCache
+from ..stats import reconcile_user_stats
+from ..etag import conditional_get
 from datetime import datetime, timezone
 import calendar
 
 # blueprint for dashboard routes
 bp = Blueprint('dashboard', __name__)
 
+# per-user cache of dashboard summaries, dropped whenever the user's data changes
+dashboard_cache = UserCache(invalidate_on_write=True)
+
+# reads every dashboard figure for a user in a single statement: the counters
+# come from the user's user_stats row and the revenue from monthly_revenue
+def dashboard_summary(user_id, year):
+    def counter(column):
+        return db.select(column).where(UserStats.user_id == user_id).scalar_subquery()
+
+    # one revenue column per month of the year
+    monthly_revenue = [
+        db.func.coalesce(db.func.sum(db.case((MonthlyRevenue.month == month, MonthlyRevenue.revenue))), 0)
+        for month in range(1, 13)
+    ]
+
+    statement = (
+        db.select(
+            counter(UserStats.total_products),
+            counter(UserStats.total_stock),
+            counter(UserStats.pending_orders),
+            counter(UserStats.total_clients),
+            *monthly_revenue,
+        )
+        .where(MonthlyRevenue.user_id == user_id, MonthlyRevenue.year == year)
+    )
+    row = db.session.execute(statement).one()
+
+    # builds the counters of users that do not have them yet
+    if row[0] is None:
+        reconcile_user_stats(user_id)
+        db.session.commit()
+        row = db.session.execute(statement).one()
+
+    return {
+        'totalProducts': row[0],
+        'totalStock': row[1],
+        'pendingOrders': row[2],
+        'totalClients': row[3],
+        'revenueData': [float(revenue) for revenue in row[4:]],
+    }
+
 # route to access the dashboard
 @bp.route('/', methods=['GET'])
 @jwt_required()
+@conditional_get(vary=lambda: datetime.now(timezone.utc).strftime('%Y-%m'))
 def dashboard():
     current_user = get_jwt_identity()
 
-    # counts total products for the current user
-    total_products = Products.query.filter_by(user_id=current_user).count()
-    
-    # calculates total stock
-    total_stock = db.session.query(db.func.coalesce(db.func.sum(Products.quantity), 0)).filter_by(user_id=current_user).scalar()
-    
-    # counts pending orders
-    pending_orders = Orders.query.filter_by(user_id=current_user, status='pending').count()
-    
-    # counts total clients
-    total_clients = Clients.query.filter_by(user_id=current_user).count()
-    
     # gets the current year and month
     current_year = datetime.now(timezone.utc).year
     current_month = datetime.now(timezone.utc).month
 
-    # calculates revenue for the current month
-    current_month_revenue = db.session.query(db.func.coalesce(MonthlyRevenue.revenue, 0)).filter_by(
-        user_id=current_user,
-        year=current_year,
-        month=current_month
-    ).scalar()
-
-    # retrieves all revenues for the current year
-    revenues = MonthlyRevenue.query.filter_by(user_id=current_user, year=current_year).all()
-
-    # initializes a dictionary to store monthly revenues
-    data_by_month = {i: 0 for i in range(1, 13)}
-    for revenue in revenues:
-        data_by_month[revenue.month] = float(revenue.revenue)
+    # reuses the cached summary unless the user's data changed (in this or any
+    # other worker process) or the year rolled over
+    version = g.get('data_version')
+    cached = dashboard_cache.get(current_user)
+    if cached is not None and version is not None and cached[:2] == (current_year, version):
+        summary = cached[2]
+    else:
+        summary = dashboard_summary(current_user, current_year)
+        dashboard_cache.set(current_user, (current_year, version, summary))
 
-    # creates lists of labels and revenue data for the months
+    # creates the list of labels for the months
     labels = [calendar.month_abbr[month] for month in range(1, 13)]
-    revenue_data = [data_by_month[month] for month in range(1, 13)]
 
     return jsonify({
-        'totalProducts': total_products,
-        'totalStock': total_stock,
-        'pendingOrders': pending_orders,
-        'currentMonthRevenue': current_month_revenue,
-        'totalClients': total_clients,
+        'totalProducts': summary['totalProducts'],
+        'totalStock': summary['totalStock'],
+        'pendingOrders': summary['pendingOrders'],
+        'currentMonthRevenue': summary['revenueData'][current_month - 1],
+        'totalClients': summary['totalClients'],
         'labels': labels,
-        'revenueData': revenue_data,
-    })
\ No newline at end of file
+        'revenueData': summary['revenueData'],
+    })
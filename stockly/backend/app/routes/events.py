@@ -0,0 +1,47 @@
+from flask import Blueprint, Response, current_app, jsonify
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity, get_jwt_request_location, create_access_token
+from ..events import event_hub
+from ..identity import EVENTS_SCOPE
+from datetime import timedelta
+
+# blueprint for the event stream
+bp = Blueprint('events', __name__)
+
+# route to get a stream token: browsers' EventSource cannot send headers, so the
+# token goes in the URL as ?jwt=<token>, where access logs and proxies see it;
+# stream tokens only open /events and expire after EVENTS_TOKEN_SECONDS, so
+# clients get a new one for every connection
+@bp.route('/events/token', methods=['POST'])
+@jwt_required()
+def events_token():
+    current_user = get_jwt_identity()
+    token = create_access_token(
+        identity=current_user,
+        additional_claims={'scope': EVENTS_SCOPE},
+        expires_delta=timedelta(seconds=current_app.config['EVENTS_TOKEN_SECONDS']),
+    )
+    return jsonify(token=token), 200
+
+# route to stream the user's order events (order_created, order_updated,
+# order_status_changed, order_deleted) as Server-Sent Events
+#
+# takes the access token in the Authorization header, or a stream token from
+# /events/token as ?jwt=<token>; a 'resync' event means events were dropped and
+# the client should fetch the current state (e.g. through /sync)
+@bp.route('/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def events():
+    current_user = get_jwt_identity()
+
+    # access tokens stay out of URLs, and so out of access logs
+    if get_jwt_request_location() == 'query_string' and get_jwt().get('scope') != EVENTS_SCOPE:
+        return jsonify(message="Only stream tokens from /events/token can be passed in the URL"), 401
+
+    subscription = event_hub.subscribe(current_user)
+    if subscription is None:
+        return jsonify(message="Too many open event streams, try again later"), 503, {'Retry-After': '5'}
+
+    response = Response(event_hub.stream(subscription), mimetype='text/event-stream')
+    response.headers['X-Accel-Buffering'] = 'no' # tells nginx not to buffer the stream
+    response.call_on_close(lambda: event_hub.unsubscribe(subscription))
+    return response
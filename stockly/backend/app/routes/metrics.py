@@ -0,0 +1,19 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+from ..extensions import metrics as request_metrics
+import hmac
+
+# blueprint for the monitoring endpoint
+bp = Blueprint('metrics', __name__)
+
+# route to read request and SQL metrics in the Prometheus text format; when
+# METRICS_TOKEN is set, scrapers must send it as a bearer token
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    if not current_app.config['METRICS_ENABLED']:
+        return jsonify(message="Metrics are not enabled"), 404
+
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify(message="Not authorized"), 401
+
+    return Response(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
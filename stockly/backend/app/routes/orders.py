@@ -1,27 +1,90 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
-from ..models import Orders, OrderItems, Products, Clients, MonthlyRevenue, Users
+from ..models import Orders, OrderItems, Products, Clients
 from ..extensions import db
-from ..schemas import OrderSchema, OrderItemSchema
-from datetime import datetime, timezone
+from ..schemas import OrderSchema, OrderItemSchema, dump_order
+from ..pagination import paginate, date_arg, date_end_arg
+from ..etag import conditional_get
+from ..stats import bump_user_stats
+from ..stock import InsufficientStock, quantities_by_product, reserve_stock, release_stock, adjust_stock
+from ..revenue import book_order_revenue, reverse_order_revenue, transition_order_status, record_order_revenues
+from ..sync import record_deletions
+from ..events import event_hub, order_event
+from ..database import is_database_busy
+from datetime import datetime
 from decimal import Decimal
 
 # blueprint for handling order-related routes
 bp = Blueprint('orders', __name__)
 
+# valid order statuses
+ORDER_STATUSES = ['pending', 'completed', 'shipped']
+
+# largest number of orders accepted by a single bulk request
+MAX_BULK_ORDERS = 5000
+
+# true for an ID sent as a whole number; JSON booleans arrive as Python bools,
+# which are ints too
+def is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+# true for a quantity sent as a whole number of at least one
+def is_positive_quantity(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 1
+
+# builds a query for the user's orders that eager-loads the user, client and
+# items in a constant number of queries; the items come from a single subquery
+# load, since selectinload runs one query per 500 orders, and carry their own
+# product details
+def load_orders(user_id):
+    return Orders.query.options(
+        db.joinedload(Orders.user),
+        db.joinedload(Orders.client),
+        db.subqueryload(Orders.items),
+    ).filter_by(user_id=user_id)
+
+# loads the details copied onto new order lines for the user's products, keyed by product ID
+def product_details(user_id, product_ids):
+    rows = db.session.execute(
+        db.select(Products.product_id, Products.price, Products.name, Products.size, Products.color)
+        .where(Products.user_id == user_id, Products.product_id.in_(product_ids))
+    ).all()
+    return {product_id: OrderItems.details_of(*details) for product_id, *details in rows}
+
 # route to get all orders for the current user
 @bp.route('/orders', methods=['GET'])
 @jwt_required()
+@conditional_get()
 def get_orders():
     current_user = get_jwt_identity()
 
-    orders = Orders.query.filter_by(user_id=current_user).all()
+    query = load_orders(current_user)
 
-    # serializes product data and returns as JSON
-    order_schema = OrderSchema(many=True)
-    result = order_schema.dump(orders)
-    return jsonify(result)
+    try:
+        # optional filters: status, client and date range
+        status = request.args.get('status')
+        if status:
+            query = query.filter(Orders.status == status)
+
+        if 'client_id' in request.args:
+            client_id = request.args.get('client_id', type=int)
+            if client_id is None:
+                raise ValueError("client_id must be a whole number")
+            query = query.filter(Orders.client_id == client_id)
+
+        date_from = date_arg('from')
+        if date_from:
+            query = query.filter(Orders.date >= date_from)
+
+        date_to, inclusive = date_end_arg('to')
+        if date_to:
+            query = query.filter(Orders.date <= date_to if inclusive else Orders.date < date_to)
+
+        # serializes order data and returns as JSON, one page at a time if requested
+        return paginate(query, Orders.order_id, lambda orders: [dump_order(order) for order in orders])
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
 
 # route to make a new order
 @bp.route('/orders/new-order', methods=['POST'])
@@ -32,7 +95,7 @@ def new_order():
 
     client_id = order_data.get('client_id') # extract client ID from order data
 
-    client = Clients.query.get(client_id) # retrieve the client object
+    client = Clients.query.filter_by(client_id=client_id, user_id=current_user).first() # retrieve the client object
 
     # check if the client exists
     if not client:
@@ -44,20 +107,28 @@ def new_order():
         status=order_data.get('status', 'pending') # default status is 'pending'
     )
 
+    items_data = order_data.get('items', [])
+    if not isinstance(items_data, list):
+        return jsonify(message="items must be a list"), 400
+
     total_price = 0 # initialize total price for the order
-    for item_data in order_data.get('items', []): # iterate over items in the order
-        product = Products.query.get(item_data['product_id']) # retrieve the product
+    for item_data in items_data: # iterate over items in the order
+        if not isinstance(item_data, dict) or not is_id(item_data.get('product_id')):
+            return jsonify(message="Each item needs a product_id"), 400
+
+        product = Products.query.filter_by(product_id=item_data['product_id'], user_id=current_user).first() # retrieve the product
         if not product:
             return jsonify({'error': f'Product not found'}), 404 # check if product exists
         
-        if not item_data['quantity']:
-            return jsonify(message="Quantity is required"), 400
+        if not is_positive_quantity(item_data.get('quantity')):
+            return jsonify(message="Quantity must be a positive whole number"), 400
 
         # create an order item
         item = OrderItems(
             user_id=current_user,
             product_id=item_data['product_id'],
             quantity=item_data['quantity'],
+            **OrderItems.details_of(product.price, product.name, product.size, product.color),
         )
 
         total_price += item.quantity * product.price # calculate total price for the order
@@ -68,76 +139,335 @@ def new_order():
     if not order.items:
         return jsonify(message="The order must have at least one item"), 400
 
+    # takes the ordered units out of stock, refusing to oversell
+    try:
+        reserve_stock(current_user, quantities_by_product((item.product_id, item.quantity) for item in order.items))
+    except InsufficientStock as e:
+        db.session.rollback()
+        return jsonify({"error": str(e), "product_id": e.product_id}), 409
+
     db.session.add(order)
+    bump_user_stats(current_user, pending=1 if order.status == 'pending' else 0)
+
+    # book the revenue of an order created as completed, like the bulk route does
+    if order.status == 'completed':
+        db.session.flush()
+        book_order_revenue(current_user, order.order_id)
     db.session.commit()
+    event_hub.publish(current_user, [order_event('order_created', order.order_id, status=order.status)])
 
     order_schema = OrderSchema()
     return jsonify(order_schema.dump(order)), 201
 
+# checks one order of a bulk request against the user's clients, product details and
+# the stock still available, returning its item rows and total price or raising ValueError
+def _validate_bulk_order(order_data, client_ids, details, available):
+    if not isinstance(order_data, dict):
+        raise ValueError("Invalid order")
+
+    if not is_id(order_data.get('client_id')) or order_data['client_id'] not in client_ids:
+        raise ValueError("Client not found")
+
+    if order_data.get('status', 'pending') not in ORDER_STATUSES:
+        raise ValueError("Invalid status")
+
+    items = order_data.get('items') or []
+    if not isinstance(items, list):
+        raise ValueError("items must be a list")
+    if not items:
+        raise ValueError("The order must have at least one item")
+
+    rows = []
+    total_price = 0
+    for item_data in items:
+        if not isinstance(item_data, dict) or not is_id(item_data.get('product_id')):
+            raise ValueError("Each item needs a product_id")
+        if item_data['product_id'] not in details:
+            raise ValueError("Product not found")
+
+        quantity = item_data.get('quantity')
+        if not is_positive_quantity(quantity):
+            raise ValueError("Quantity must be a positive whole number")
+
+        line_details = details[item_data['product_id']]
+        rows.append({'product_id': item_data['product_id'], 'quantity': quantity, **line_details})
+        total_price += quantity * line_details['unit_price']
+
+    # sets aside the stock this order needs for the orders after it
+    needed = quantities_by_product((row['product_id'], row['quantity']) for row in rows)
+    for product_id, quantity in needed.items():
+        if available[product_id] < quantity:
+            raise ValueError(f"Insufficient stock for product {product_id}")
+    for product_id, quantity in needed.items():
+        available[product_id] -= quantity
+
+    return rows, total_price
+
+# route to create many orders at once
+@bp.route('/orders/bulk', methods=['POST'])
+@jwt_required()
+def bulk_orders():
+    current_user = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    orders_data = data.get('orders') if isinstance(data, dict) else None
+
+    if not isinstance(orders_data, list) or not orders_data:
+        return jsonify(message="A list of orders is required"), 400
+
+    if len(orders_data) > MAX_BULK_ORDERS:
+        return jsonify(message=f"At most {MAX_BULK_ORDERS} orders can be sent at once"), 400
+
+    # collects every referenced client and product
+    client_ids = set()
+    product_ids = set()
+    for order_data in orders_data:
+        if not isinstance(order_data, dict):
+            continue
+        if is_id(order_data.get('client_id')):
+            client_ids.add(order_data['client_id'])
+        items = order_data.get('items')
+        for item_data in items if isinstance(items, list) else []:
+            if isinstance(item_data, dict) and is_id(item_data.get('product_id')):
+                product_ids.add(item_data['product_id'])
+
+    # validates them with one IN (...) query each, only matching the user's own rows
+    client_ids = set(db.session.execute(
+        db.select(Clients.client_id)
+        .where(Clients.user_id == current_user, Clients.client_id.in_(client_ids))
+    ).scalars())
+    products = db.session.execute(
+        db.select(Products.product_id, Products.price, Products.name, Products.size, Products.color, Products.quantity)
+        .where(Products.user_id == current_user, Products.product_id.in_(product_ids))
+    ).all()
+    details = {
+        product.product_id: OrderItems.details_of(product.price, product.name, product.size, product.color)
+        for product in products
+    }
+    available = {product.product_id: product.quantity for product in products}
+
+    # validates each order and computes its total from the product prices
+    valid = []
+    errors = []
+    for index, order_data in enumerate(orders_data):
+        try:
+            rows, total_price = _validate_bulk_order(order_data, client_ids, details, available)
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+            continue
+        valid.append((index, order_data, rows, total_price))
+
+    if not valid:
+        return jsonify(created=[], errors=errors), 400
+
+    try:
+        # inserts the orders, then all of their items, in one transaction
+        now = datetime.utcnow()
+        order_ids = db.session.execute(
+            db.insert(Orders).returning(Orders.order_id, sort_by_parameter_order=True),
+            [
+                {
+                    'user_id': current_user,
+                    'client_id': order_data['client_id'],
+                    'status': order_data.get('status', 'pending'),
+                    'date': now,
+                    'total_price': total_price,
+                }
+                for _, order_data, _, total_price in valid
+            ],
+        ).scalars().all()
+
+        db.session.execute(db.insert(OrderItems), [
+            dict(row, user_id=current_user, order_id=order_id)
+            for order_id, (_, _, rows, _) in zip(order_ids, valid)
+            for row in rows
+        ])
+
+        # takes the ordered units out of stock with one conditional update per product
+        reserve_stock(current_user, quantities_by_product(
+            (row['product_id'], row['quantity']) for _, _, rows, _ in valid for row in rows
+        ))
+
+        statuses = [order_data.get('status', 'pending') for _, order_data, _, _ in valid]
+        bump_user_stats(current_user, pending=statuses.count('pending'))
+
+        # books the revenue of orders created as completed
+        record_order_revenues(current_user, [
+            (order_id, Decimal(str(total_price)))
+            for order_id, status, (_, _, _, total_price) in zip(order_ids, statuses, valid)
+            if status == 'completed'
+        ])
+
+        db.session.commit()
+    except InsufficientStock as e:
+        # stock changed since it was checked above; nothing from this request is saved
+        db.session.rollback()
+        return jsonify({"error": str(e), "product_id": e.product_id}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+    # one batch for the whole request, so a large import takes a single place in each stream's queue
+    event_hub.publish(current_user, [
+        order_event('order_created', order_id, status=status) for order_id, status in zip(order_ids, statuses)
+    ])
+
+    created = [{'index': index, 'order_id': order_id} for order_id, (index, _, _, _) in zip(order_ids, valid)]
+    return jsonify(created=created, errors=errors), 201
+
 # route to get or update a specific order by ID
 @bp.route('/orders/details/<int:order_id>', methods=['GET', 'PUT'])
 @jwt_required()
 def update_order(order_id):
     current_user = get_jwt_identity()
 
-    order = Orders.query.filter_by(order_id=order_id, user_id=current_user).first()
-
-    if not order:
-        return jsonify(message="Order not found"), 404
-
     # handles the GET method to retrieve order details
     if request.method == 'GET':
+        # loads the order and its items in a single joined query
+        order = (
+            Orders.query
+            .options(db.joinedload(Orders.items))
+            .filter_by(order_id=order_id, user_id=current_user)
+            .first()
+        )
+
+        if not order:
+            return jsonify(message="Order not found"), 404
+
+        items = []
+        for item in order.items:
+            price, name, size, _ = item.product_details()
+            items.append({
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "price": price if price is not None else 0,
+                "product_name": name if price is not None else "Unknown",
+                "product_size": size if price is not None else "Unknown",
+                "total": price * item.quantity if price is not None else 0,
+            })
+
         order_data = {
             "client_id": order.client_id,
-            "items": [
-                {
-                    "product_id": item.product_id,
-                    "quantity": item.quantity,
-                    "price": Products.query.get(item.product_id).price if Products.query.get(item.product_id) else 0,
-                    "product_name": Products.query.get(item.product_id).name if Products.query.get(item.product_id) else "Unknown",
-                    "product_size": Products.query.get(item.product_id).size if Products.query.get(item.product_id) else "Unknown",
-                    "total": Products.query.get(item.product_id).price * item.quantity if Products.query.get(item.product_id) else 0,
-                } for item in order.items
-            ],
+            "items": items,
             "total_price": order.total_price
         }
         return jsonify(order_data), 200
 
+    order = Orders.query.filter_by(order_id=order_id, user_id=current_user).first()
+
+    if not order:
+        return jsonify(message="Order not found"), 404
+
     # handles the PUT method to update order details
     data = request.get_json()
 
-    # update order details with new data
-    order.client_id = data.get('client_id', order.client_id)
+    # checks the new client, if one was sent, belongs to the user
+    client_id = data.get('client_id', order.client_id)
+    if not is_id(client_id):
+        return jsonify({"error": "Client not found"}), 404
+    if client_id != order.client_id and not Clients.query.filter_by(client_id=client_id, user_id=current_user).first():
+        return jsonify({"error": "Client not found"}), 404
 
-    # clear existing order items
-    db.session.query(OrderItems).filter_by(order_id=order.order_id).delete()
+    # validates the new items and adds up the quantity wanted per product
+    items_data = data.get('items', [])
+    if not isinstance(items_data, list):
+        return jsonify(message="items must be a list"), 400
+    for item_data in items_data:
+        if not isinstance(item_data, dict) or not is_id(item_data.get('product_id')):
+            return jsonify(message="Each item needs a product_id"), 400
+        if not is_positive_quantity(item_data.get('quantity')):
+            return jsonify(message="Quantity must be a positive whole number"), 400
 
-    total_price = 0 # initialize total price for the updated order
-    for item_data in data.get('items', []): # iterate over new items
-        product = Products.query.get(item_data['product_id'])
-        if not product:
-            return jsonify({'error': f'Product not found'}), 404
-        
-        if not item_data['quantity']:
-            return jsonify(message="Quantity is required"), 400
+    new_quantities = quantities_by_product((item_data['product_id'], item_data['quantity']) for item_data in items_data)
 
-        # create a new order item
-        item = OrderItems(
-            user_id=current_user,
-            product_id=item_data['product_id'],
-            quantity=item_data['quantity'],
-        )
-        
-        total_price += item.quantity * product.price # calculate total price
-        order.items.append(item) # add item to the order
-    
-    order.total_price = total_price # set the updated total price
-
-    if not order.items:
+    if not new_quantities:
         return jsonify(message="The order must have at least one item"), 400
 
-    db.session.commit()
+    # loads the needed products, then the existing lines, with one query each
+    details = product_details(current_user, new_quantities)
+    if len(details) != len(new_quantities):
+        return jsonify({'error': f'Product not found'}), 404
+
+    lines = db.session.execute(
+        db.select(OrderItems.order_item_id, OrderItems.product_id, OrderItems.quantity, OrderItems.unit_price)
+        .where(OrderItems.order_id == order_id)
+        .order_by(OrderItems.order_item_id)
+    ).all()
+
+    # works out which lines to keep, change, add and remove: each product keeps
+    # its first existing line, any other lines for it are removed; kept lines keep
+    # the price they were ordered at, new lines take the current price
+    old_quantities = quantities_by_product((product_id, quantity) for _, product_id, quantity, _ in lines)
+    kept = {}
+    prices = {}
+    deletes = []
+    updates = []
+    for order_item_id, product_id, quantity, unit_price in lines:
+        if product_id in kept or product_id not in new_quantities:
+            deletes.append(order_item_id)
+            continue
+        kept[product_id] = order_item_id
+        prices[product_id] = unit_price
+        change = {}
+        if quantity != new_quantities[product_id]:
+            change['quantity'] = new_quantities[product_id]
+        if unit_price is None:
+            # lines written before details were copied take them now
+            change.update(details[product_id])
+            prices[product_id] = details[product_id]['unit_price']
+        if change:
+            updates.append({'order_item_id': order_item_id, **change})
+
+    inserts = [
+        {'user_id': current_user, 'order_id': order_id, 'product_id': product_id, 'quantity': quantity, **details[product_id]}
+        for product_id, quantity in new_quantities.items() if product_id not in kept
+    ]
+    for product_id in new_quantities:
+        prices.setdefault(product_id, details[product_id]['unit_price'])
+
+    # the revenue and sales booked for a completed order follow its lines and
+    # client: they are reversed and booked again, as if the order had been moved
+    # out of 'completed', edited and completed again
+    rebook = order.status == 'completed' and bool(deletes or updates or inserts or client_id != order.client_id)
+
+    try:
+        if rebook:
+            # the guarded update keeps a concurrent status change from booking in between
+            if not transition_order_status(current_user, order_id, 'completed', 'completed'):
+                db.session.rollback()
+                return jsonify({"error": "The order status was changed by another request"}), 409
+            reverse_order_revenue(current_user, order_id)
+
+        # writes only the lines that changed
+        if deletes:
+            db.session.execute(
+                db.delete(OrderItems).where(OrderItems.order_item_id.in_(deletes)),
+                execution_options={'synchronize_session': False},
+            )
+        if updates:
+            db.session.execute(db.update(OrderItems), updates)
+        if inserts:
+            db.session.execute(db.insert(OrderItems), inserts)
+
+        # moves stock in or out by the change in each product's quantity
+        adjust_stock(current_user, old_quantities, new_quantities)
+
+        order.client_id = client_id
+        order.total_price = sum(quantity * prices[product_id] for product_id, quantity in new_quantities.items())
+        order.updated_at = datetime.utcnow() # the lines may change while the order row does not
+        if rebook:
+            book_order_revenue(current_user, order_id)
+        db.session.commit()
+    except InsufficientStock as e:
+        db.session.rollback()
+        return jsonify({"error": str(e), "product_id": e.product_id}), 409
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify(message=str(e)), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
 
+    event_hub.publish(current_user, [order_event('order_updated', order_id)])
     return jsonify(message="Order updated successfully"), 200
 
 # route to delete a specific order by ID
@@ -146,21 +476,18 @@ def update_order(order_id):
 def delete_order(order_id):
     current_user = get_jwt_identity()
 
-    # get the current date and month
-    now = datetime.now(timezone.utc)
-    current_year = now.year
-    current_month = now.month
-
     order = Orders.query.filter_by(order_id=order_id, user_id=current_user).first()
 
     if not order:
         return jsonify({"error": "Order not found"}), 404
     
-    # check if there's a corresponding MonthlyRevenue record for this order
-    monthly_revenue = MonthlyRevenue.query.filter_by(month=current_month, year=current_year).first()
-    if monthly_revenue:
-        # remove the revenue record
-        db.session.delete(monthly_revenue)
+    # reverse the revenue booked for the order if it was completed
+    if order.status == 'completed':
+        reverse_order_revenue(current_user, order_id)
+
+    # return the stock held by orders that were never fulfilled
+    if order.status == 'pending':
+        release_stock(current_user, quantities_by_product((item.product_id, item.quantity) for item in order.items))
     
     # delete order items associated with the order
     order_items = OrderItems.query.filter_by(order_id=order_id, user_id=current_user).all()
@@ -169,7 +496,10 @@ def delete_order(order_id):
 
     # delete the order
     db.session.delete(order)
+    record_deletions(current_user, 'orders', [order_id])
+    bump_user_stats(current_user, pending=-1 if order.status == 'pending' else 0)
     db.session.commit()
+    event_hub.publish(current_user, [order_event('order_deleted', order_id)])
 
     return jsonify(message="Order deleted successfully"), 200
 
@@ -189,65 +519,38 @@ def update_order_status(order_id):
         new_status = data.get('status')
 
         # validate new status
-        if new_status not in ['pending', 'completed', 'shipped']:
+        if new_status not in ORDER_STATUSES:
             return jsonify({"error": "Invalid status"}), 400
 
         # store the old status of the order
         old_status = order.status
 
-        # update the order's status with the new status
-        order.status = new_status
-        db.session.commit()
-
-        # get the current date and month
-        now = datetime.now(timezone.utc)
-        current_year = now.year
-        current_month = now.month
-
-        # if the old status was 'completed', adjust the monthly revenue
-        if old_status == 'completed' and new_status != 'completed':
-            completed_order_revenue = (
-                db.session.query(db.func.coalesce(db.func.sum(Products.price * OrderItems.quantity), 0))
-                .select_from(OrderItems)
-                .join(Products)
-                .join(Orders)
-                .filter(Orders.order_id == order_id)
-            ).scalar() # calculate the revenue from the completed order
-
-            # check if there is already a revenue record for this order
-            existing_revenue = MonthlyRevenue.query.filter_by(user_id=current_user, year=current_year, month=current_month).first()
-            if existing_revenue:
-                existing_revenue.revenue -= Decimal(completed_order_revenue)  # subtract the revenue from the completed order
-                if existing_revenue.revenue < 0:
-                    existing_revenue.revenue = Decimal(0)  # ensure the revenue does not go negative
-            else:
-                return jsonify({"error": "Revenue record not found."}), 404
-
         # check if both old and new statuses are 'completed', and do nothing if they are
         if old_status == 'completed' and new_status == 'completed':
             return jsonify({"message": "No changes needed, status remains 'completed'."}), 200
 
-        # if the new status is 'completed', adjust the monthly revenue
+        # update the order's status only if no other request changed it in the meantime
+        if not transition_order_status(current_user, order_id, old_status, new_status):
+            db.session.rollback()
+            return jsonify({"error": "The order status was changed by another request"}), 409
+
+        bump_user_stats(current_user, pending=(new_status == 'pending') - (old_status == 'pending'))
+
+        # if the old status was 'completed', reverse the revenue booked for the order
+        if old_status == 'completed' and new_status != 'completed':
+            reverse_order_revenue(current_user, order_id)
+
+        # if the new status is 'completed', book the order's revenue in the current month
         if new_status == 'completed' and old_status != 'completed':
-            completed_order_revenue = (
-                db.session.query(db.func.coalesce(db.func.sum(Products.price * OrderItems.quantity), 0))
-                .select_from(OrderItems)
-                .join(Products)
-                .join(Orders)
-                .filter(Orders.order_id == order_id)
-            ).scalar() # calculate the revenue from the order being completed
-
-            # check if there is already a revenue record for the current month
-            existing_revenue = MonthlyRevenue.query.filter_by(user_id=current_user, year=current_year, month=current_month).first()
-            if existing_revenue:
-                existing_revenue.revenue += Decimal(completed_order_revenue)  # add the revenue from the completed order
-                existing_revenue.order_id = order_id  # add order id to the revenue
-            else:
-                # create a new revenue record for the current month if it doesn't exist
-                new_revenue = MonthlyRevenue(user_id=current_user, order_id=order_id, year=current_year, month=current_month, revenue=Decimal(completed_order_revenue))
-                db.session.add(new_revenue)
-
-        db.session.commit()  # save changes to the database
+            book_order_revenue(current_user, order_id)
+
+        db.session.commit()  # save the status and revenue changes together
+        db.session.refresh(order)
+
+        if new_status != old_status:
+            event_hub.publish(current_user, [
+                order_event('order_status_changed', order_id, status=new_status, previous_status=old_status)
+            ])
 
         return jsonify({
             "message": "Order status updated successfully",
@@ -263,6 +566,9 @@ def update_order_status(order_id):
     # rollback any changes in case of an error
     except Exception as e:
         db.session.rollback()
+        # nothing was written when every other writer kept the database busy
+        if is_database_busy(e):
+            return jsonify({"error": "The database is busy, please try again"}), 503, {'Retry-After': '1'}
         return jsonify({"error": str(e)}), 500
     
 # route to print data of specific order
@@ -271,9 +577,10 @@ def update_order_status(order_id):
 def print_order(order_id):
     current_user = get_jwt_identity()
 
-    order = Orders.query.filter_by(order_id=order_id, user_id=current_user).first()
+    order = load_orders(current_user).filter_by(order_id=order_id).first()
 
-    # serializes product data and returns as JSON
-    order_schema = OrderSchema()
-    result = order_schema.dump(order)
-    return jsonify(result)
\ No newline at end of file
+    if not order:
+        return jsonify({"error": "Order not found"}), 404
+
+    # serializes order data and returns as JSON
+    return jsonify(dump_order(order))
\ No newline at end of file
@@ -1,26 +1,91 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, g, jsonify, request, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import Products, OrderItems
 from ..extensions import db
 from ..schemas import ProductSchema
+from ..pagination import paginate
+from ..etag import conditional_get
+from ..stats import bump_user_stats
+from ..cache import mark_user_written
+from ..search import index_records, unindex_records, search_page
+from ..restock import restock_cache, restock_report
+from ..sync import record_deletions, touch_orders, ordering_product
+from ..product_io import (
+    FORMATS, PRODUCT_FIELDS, IMPORT_CHUNK_SIZE, EXPORT_BATCH_SIZE,
+    upload_format, read_product_rows, chunked, export_lines,
+)
+from datetime import datetime, timezone
 
 # blueprint for product-related routes
 bp = Blueprint('products', __name__)
 
+# most row errors reported back by a single import
+MAX_IMPORT_ERRORS = 100
+
 # route to access products
 @bp.route('/products', methods=['GET'])
 @jwt_required() # requires authentication 
+@conditional_get()
 def products():
     current_user = get_jwt_identity()
 
-    # fetches all products for the current user
-    products = Products.query.filter_by(user_id=current_user).all()
+    # fetches the products for the current user
+    query = Products.query.filter_by(user_id=current_user)
+
+    # optional filters: name prefix and low-stock threshold
+    name = request.args.get('name')
+    if name:
+        query = query.filter(Products.name.startswith(name, autoescape=True))
+
+    if 'low_stock' in request.args:
+        low_stock = request.args.get('low_stock', type=int)
+        if low_stock is None:
+            return jsonify(message="low_stock must be a whole number"), 400
+        query = query.filter(Products.quantity <= low_stock)
 
-    # serializes product data and returns as JSON
+    # serializes product data and returns as JSON, one page at a time if requested
     product_schema = ProductSchema(many=True)
-    result = product_schema.dump(products)
-    return jsonify(result)
+    try:
+        return paginate(query, Products.product_id, product_schema.dump)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+# route to search products by name, color, size and description, best matches first
+@bp.route('/products/search', methods=['GET'])
+@jwt_required()
+@conditional_get()
+def search_products():
+    current_user = get_jwt_identity()
+
+    product_schema = ProductSchema(many=True)
+    try:
+        return search_page('products', current_user, product_schema.dump)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
     
+# route to read restock recommendations: by default the products at or below
+# their reorder point, least days of cover first, or every product with ?all=1
+@bp.route('/products/restock', methods=['GET'])
+@jwt_required()
+@conditional_get(vary=lambda: datetime.now(timezone.utc).date().isoformat())
+def restock():
+    current_user = get_jwt_identity()
+    today = datetime.now(timezone.utc).date()
+
+    # reuses the cached report until the user's data changes (in this or any
+    # other worker process) or the day rolls over
+    version = g.get('data_version')
+    cached = restock_cache.get(current_user)
+    if cached is not None and version is not None and cached[:2] == (today, version):
+        report = cached[2]
+    else:
+        report = restock_report(current_user, today)
+        restock_cache.set(current_user, (today, version, report))
+
+    if request.args.get('all') not in ('1', 'true'):
+        report = [product for product in report if product['needs_restock']]
+    return jsonify(report), 200
+
 # route to register a new product
 @bp.route('/products/register-product', methods=['POST'])
 @jwt_required()
@@ -57,6 +122,9 @@ def register_product():
         quantity=quantity
     )
     db.session.add(new_product)
+    db.session.flush() # assigns the product ID used by the search index
+    index_records('products', [new_product])
+    bump_user_stats(current_user, products=1, stock=int(quantity))
     db.session.commit()
 
     return jsonify(message="The product has been registered"), 201
@@ -94,14 +162,31 @@ def update_product(product_id):
     product.dimensions = data.get('dimensions', product.dimensions)
     product.price = data.get('price', product.price)
     product.description = data.get('description', product.description)
-    product.quantity = data.get('quantity', product.quantity)
+    quantity = data.get('quantity', product.quantity)
 
-    if product.name is None or product.price is None or product.quantity is None:
+    if product.name is None or product.price is None or quantity is None:
         return jsonify(message="Product name, price, and quantity are required"), 400
     
-    if not str(product.quantity).isdigit():
+    if not str(quantity).isdigit():
         return jsonify(message="Quantity must be a whole number without letters or symbols"), 400
 
+    index_records('products', [product])
+
+    # writes the new quantity only if the stored one is still the one read above,
+    # so units reserved by orders in the meantime are never overwritten; the
+    # client is told to retry with the current stock instead
+    change = int(quantity) - product.quantity
+    if change:
+        result = db.session.execute(
+            db.update(Products)
+            .where(Products.product_id == product_id, Products.user_id == current_user, Products.quantity == product.quantity)
+            .values(quantity=int(quantity))
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            return jsonify({"error": "Stock changed while the product was updated", "product_id": product_id}), 409
+        bump_user_stats(current_user, stock=change)
     db.session.commit()
 
     return jsonify(message="Product updated successfully"), 200
@@ -118,11 +203,121 @@ def delete_product(product_id):
         return jsonify(message="Product not found"), 404
 
     try:
+        # orders lose their lines for the product along with it
+        touch_orders(current_user, ordering_product(product_id))
         db.session.delete(product)
+        unindex_records('products', [product_id])
+        record_deletions(current_user, 'products', [product_id])
+        bump_user_stats(current_user, products=-1, stock=-product.quantity)
         db.session.commit()
     except Exception as e:
         # rolls back the transaction if deletion fails
         db.session.rollback()
         return jsonify(message=f"An error occurred: {str(e)}"), 500
 
-    return jsonify(message="Product deleted successfully"), 200
\ No newline at end of file
+    return jsonify(message="Product deleted successfully"), 200
+
+# inserts or updates one chunk of imported products, returning how many were created and updated
+def _save_product_chunk(user_id, rows):
+    # finds which of the referenced products already belong to the user
+    product_ids = {row['product_id'] for row in rows if row['product_id'] is not None}
+    existing = dict(db.session.execute(
+        db.select(Products.product_id, Products.quantity)
+        .where(Products.user_id == user_id, Products.product_id.in_(product_ids))
+    ).all()) if product_ids else {}
+
+    updates = [row for row in rows if row['product_id'] in existing]
+    inserts = [
+        dict(row, product_id=None, user_id=user_id)
+        for row in rows if row['product_id'] not in existing
+    ]
+    for row in inserts:
+        del row['product_id']
+
+    # bulk updates by primary key name no user, so the write is recorded here
+    mark_user_written(user_id)
+    if updates:
+        db.session.execute(db.update(Products), updates)
+        index_records('products', updates)
+    if inserts:
+        # the new rows come back with their IDs for the search index
+        new_rows = db.session.execute(
+            db.insert(Products).returning(Products.product_id, Products.name, Products.color, Products.size, Products.description),
+            inserts,
+        ).mappings().all()
+        index_records('products', new_rows)
+
+    bump_user_stats(
+        user_id,
+        products=len(inserts),
+        stock=sum(row['quantity'] for row in inserts)
+            + sum(row['quantity'] - existing[row['product_id']] for row in updates),
+    )
+    return len(inserts), len(updates)
+
+# route to import products from a CSV or NDJSON upload
+#
+# rows with the product_id of one of the user's products update it, other rows
+# create new products; the upload is read and saved in chunks so memory use
+# does not depend on its size
+@bp.route('/products/import', methods=['POST'])
+@jwt_required()
+def import_products():
+    current_user = get_jwt_identity()
+
+    # accepts either a multipart upload in the 'file' field or the raw request body
+    upload = request.files.get('file')
+    fmt = upload_format(request, upload)
+    if not fmt:
+        return jsonify(message="Upload must be CSV or NDJSON"), 400
+
+    stream = upload.stream if upload else request.stream
+
+    created = updated = failed = 0
+    errors = []
+    try:
+        for chunk in chunked(read_product_rows(stream, fmt), IMPORT_CHUNK_SIZE):
+            rows = []
+            for line, row, error in chunk:
+                if error:
+                    failed += 1
+                    if len(errors) < MAX_IMPORT_ERRORS:
+                        errors.append({'line': line, 'error': error})
+                else:
+                    rows.append(row)
+
+            if rows:
+                chunk_created, chunk_updated = _save_product_chunk(current_user, rows)
+                db.session.commit()
+                created += chunk_created
+                updated += chunk_updated
+    except Exception as e:
+        # rolls back the chunk being written; earlier chunks stay imported
+        db.session.rollback()
+        return jsonify(message=f"An error occurred: {str(e)}", created=created, updated=updated), 500
+
+    return jsonify(created=created, updated=updated, failed=failed, errors=errors), 200
+
+# route to export all products as a streamed CSV or NDJSON download
+@bp.route('/products/export', methods=['GET'])
+@jwt_required()
+def export_products():
+    current_user = get_jwt_identity()
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify(message="Format must be csv or ndjson"), 400
+
+    # reads the products in batches through a server-side cursor where supported
+    result = db.session.execute(
+        db.select(*(getattr(Products, field) for field in PRODUCT_FIELDS))
+        .where(Products.user_id == current_user)
+        .order_by(Products.product_id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    return Response(
+        stream_with_context(export_lines(result.partitions(), fmt)),
+        mimetype=FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename=products.{fmt}'},
+    )
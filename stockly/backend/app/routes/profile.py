@@ -1,29 +1,37 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models import Users
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user as current_profile
+from ..models import (
+    Users, RevenueEvents, SalesEvents, Tombstones, DailyRevenue, DailyProductSales, DailyClientSales,
+    MonthlyProductSales, MonthlyClientSales,
+)
 from ..extensions import db
+from ..identity import forget_user
+from ..sync import touch_orders
 import re
 
 # blueprint for user profile routes
 bp = Blueprint('profile', __name__)
 
+# the ledgers, rollups and tombstones that reference a user without an ORM
+# relationship, so deleting the user does not reach them
+USER_RECORDS = (
+    RevenueEvents, SalesEvents, Tombstones, DailyRevenue, DailyProductSales, DailyClientSales,
+    MonthlyProductSales, MonthlyClientSales,
+)
+
 # route to access user profile
 @bp.route('/profile', methods=['GET'])
 @jwt_required()
 def profile():
-    current_user = get_jwt_identity()
-
-    # get user's profile from the database and returns 404 error if the user is not found
-    user = Users.query.filter_by(user_id=current_user).first()
-    if not user:
-        return jsonify(message="User not found"), 404
+    # the user's profile was already loaded (or taken from cache) while checking the token
+    user = current_profile
     
     # returns user's profile details as a JSON response
     return jsonify({
-        'user_id': user.user_id,
-        'name': user.name,
-        'email': user.email,
-        'phone_number': user.phone_number
+        'user_id': user['user_id'],
+        'name': user['name'],
+        'email': user['email'],
+        'phone_number': user['phone_number']
     })
 
 # route to edit profile information
@@ -53,6 +61,8 @@ def edit_profile():
 
         # updates the user's name, email, or phone number if provided
         if new_name is not None:  # update only if provided
+            if new_name != user.name:
+                touch_orders(current_user) # orders are served with the user's name
             user.name = new_name
         if new_email is not None:  # update only if provided
             user.email = new_email
@@ -64,6 +74,7 @@ def edit_profile():
             return jsonify(message="Name and email are required"), 400
 
         db.session.commit()
+        forget_user(current_user)
         return jsonify({'message': 'Profile updated successfully'}), 200
     
     except Exception as e:
@@ -85,9 +96,13 @@ def delete_user(user_id):
         return jsonify(message="User not found"), 404
 
     try:
-        # deletes user's account from the database
+        # deletes user's account from the database, after the rows that would
+        # otherwise keep referencing it
+        for model in USER_RECORDS:
+            db.session.execute(db.delete(model).where(model.user_id == user_id))
         db.session.delete(user)
         db.session.commit()
+        forget_user(user_id)
         return jsonify(message="Account deleted successfully"), 200
     except Exception as e:
         #rolls back the transaction if an error occurs while deleting
@@ -0,0 +1,46 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..models import Products, Clients, Orders
+from ..schemas import ProductSchema, ClientSchema, dump_order
+from ..etag import conditional_get
+from ..sync import changes_since, parse_sync_token, sync_token
+from .orders import load_orders
+from datetime import datetime, timezone
+
+# blueprint for the delta sync route
+bp = Blueprint('sync', __name__)
+
+# route to read the user's products, clients and orders written since a previous
+# sync, and the IDs of those deleted, in one response
+#
+# without 'since' (or with one too old to have its deletions) every row is sent
+# with "full": true and the client should replace what it holds; either way the
+# response carries the token to send as 'since' next time
+@bp.route('/sync', methods=['GET'])
+@jwt_required()
+@conditional_get()
+def sync():
+    current_user = get_jwt_identity()
+
+    since = request.args.get('since')
+    try:
+        since = parse_sync_token(since) if since else None
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    # the next sync starts from before any of the rows below are read
+    token = sync_token(datetime.now(timezone.utc).replace(tzinfo=None))
+    filters, deleted = changes_since(current_user, since)
+
+    products = Products.query.filter_by(user_id=current_user).filter(*filters['products']).order_by(Products.product_id)
+    clients = Clients.query.filter_by(user_id=current_user).filter(*filters['clients']).order_by(Clients.client_id)
+    orders = load_orders(current_user).filter(*filters['orders']).order_by(Orders.order_id)
+
+    return jsonify(
+        full=deleted is None,
+        token=token,
+        products=ProductSchema(many=True).dump(products),
+        clients=ClientSchema(many=True).dump(clients),
+        orders=[dump_order(order) for order in orders],
+        deleted=deleted or {},
+    ), 200
@@ -0,0 +1,204 @@
+from flask.cli import with_appcontext
+from .models import (
+    Orders, OrderItems, Products, SalesEvents, DailyRevenue, DailyProductSales, DailyClientSales,
+    MonthlyProductSales, MonthlyClientSales,
+)
+from .extensions import db
+from .rollups import add_to_rollup
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+import click
+
+# revenue of an order line: its copied price, or its product's for lines not backfilled yet
+def _line_revenue():
+    current_price = db.select(Products.price).where(Products.product_id == OrderItems.product_id).scalar_subquery()
+    return db.func.coalesce(OrderItems.unit_price, current_price) * OrderItems.quantity
+
+# applies sales events to the daily and monthly rollups; 'order_counts' maps (day, client ID)
+# to the change in the number of orders sold
+def _apply_to_rollups(user_id, events, order_counts):
+    days = defaultdict(lambda: [0, Decimal(0)])
+    products = defaultdict(lambda: [0, Decimal(0)])
+    clients = defaultdict(lambda: [0, Decimal(0)])
+
+    for event in events:
+        days[event['day']][1] += event['revenue']
+        if event['product_id'] is not None:
+            products[event['day'], event['product_id']][0] += event['units']
+            products[event['day'], event['product_id']][1] += event['revenue']
+        if event['client_id'] is not None:
+            clients[event['day'], event['client_id']][1] += event['revenue']
+
+    for (day, client_id), count in order_counts.items():
+        days[day][0] += count
+        if client_id is not None:
+            clients[day, client_id][0] += count
+
+    add_to_rollup(DailyRevenue, ['user_id', 'day'], [
+        {'user_id': user_id, 'day': day, 'orders': orders, 'revenue': revenue}
+        for day, (orders, revenue) in days.items()
+    ])
+    add_to_rollup(DailyProductSales, ['user_id', 'day', 'product_id'], [
+        {'user_id': user_id, 'day': day, 'product_id': product_id, 'units': units, 'revenue': revenue}
+        for (day, product_id), (units, revenue) in products.items()
+    ])
+    add_to_rollup(DailyClientSales, ['user_id', 'day', 'client_id'], [
+        {'user_id': user_id, 'day': day, 'client_id': client_id, 'orders': orders, 'revenue': revenue}
+        for (day, client_id), (orders, revenue) in clients.items()
+    ])
+
+    product_months = defaultdict(lambda: [0, Decimal(0)])
+    for (day, product_id), (units, revenue) in products.items():
+        product_months[day.year, day.month, product_id][0] += units
+        product_months[day.year, day.month, product_id][1] += revenue
+    client_months = defaultdict(lambda: [0, Decimal(0)])
+    for (day, client_id), (orders, revenue) in clients.items():
+        client_months[day.year, day.month, client_id][0] += orders
+        client_months[day.year, day.month, client_id][1] += revenue
+
+    add_to_rollup(MonthlyProductSales, ['user_id', 'year', 'month', 'product_id'], [
+        {'user_id': user_id, 'year': year, 'month': month, 'product_id': product_id, 'units': units, 'revenue': revenue}
+        for (year, month, product_id), (units, revenue) in product_months.items()
+    ])
+    add_to_rollup(MonthlyClientSales, ['user_id', 'year', 'month', 'client_id'], [
+        {'user_id': user_id, 'year': year, 'month': month, 'client_id': client_id, 'orders': orders, 'revenue': revenue}
+        for (year, month, client_id), (orders, revenue) in client_months.items()
+    ])
+
+# books the sales of completed orders on the current day: one ledger row per
+# order and product, applied to the sales rollups
+def book_order_sales(user_id, order_ids):
+    if not order_ids:
+        return
+
+    now = datetime.now(timezone.utc)
+    lines = db.session.execute(
+        db.select(OrderItems.order_id, Orders.client_id, OrderItems.product_id,
+                  db.func.sum(OrderItems.quantity), db.func.sum(_line_revenue()))
+        .join(Orders, Orders.order_id == OrderItems.order_id)
+        .where(Orders.user_id == user_id, OrderItems.order_id.in_(order_ids))
+        .group_by(OrderItems.order_id, Orders.client_id, OrderItems.product_id)
+    ).all()
+    if not lines:
+        return
+
+    events = [
+        {'user_id': user_id, 'order_id': order_id, 'client_id': client_id, 'product_id': product_id,
+         'day': now.date(), 'units': units, 'revenue': Decimal(str(revenue)), 'created_at': now}
+        for order_id, client_id, product_id, units, revenue in lines
+    ]
+    db.session.execute(db.insert(SalesEvents), events)
+
+    order_counts = defaultdict(int)
+    for order_id, client_id in {(event['order_id'], event['client_id']) for event in events}:
+        order_counts[now.date(), client_id] += 1
+    _apply_to_rollups(user_id, events, order_counts)
+
+# reverses whatever sales are booked for an order, on the days they were booked
+def reverse_order_sales(user_id, order_id):
+    booked = db.session.execute(
+        db.select(SalesEvents.day, SalesEvents.client_id, SalesEvents.product_id,
+                  db.func.sum(SalesEvents.units), db.func.sum(SalesEvents.revenue))
+        .where(SalesEvents.user_id == user_id, SalesEvents.order_id == order_id)
+        .group_by(SalesEvents.day, SalesEvents.client_id, SalesEvents.product_id)
+    ).all()
+
+    now = datetime.now(timezone.utc)
+    events = [
+        {'user_id': user_id, 'order_id': order_id, 'client_id': client_id, 'product_id': product_id,
+         'day': day, 'units': -units, 'revenue': -Decimal(str(revenue)), 'created_at': now}
+        for day, client_id, product_id, units, revenue in booked
+        if units or revenue
+    ]
+    if not events:
+        return
+    db.session.execute(db.insert(SalesEvents), events)
+
+    order_counts = defaultdict(int)
+    for day, client_id in {(event['day'], event['client_id']) for event in events if event['units'] < 0}:
+        order_counts[day, client_id] -= 1
+    _apply_to_rollups(user_id, events, order_counts)
+
+# rebuilds the sales rollups from the sales ledger, first booking completed orders
+# that have no ledger rows (those completed before it existed) on their order date
+#
+# runs inside the caller's transaction; pass a user ID to rebuild a single user
+def rebuild_sales_rollups(user_id=None):
+    def for_user(query, model):
+        return query if user_id is None else query.where(model.user_id == user_id)
+
+    booked = db.select(SalesEvents.event_id).where(
+        SalesEvents.user_id == Orders.user_id, SalesEvents.order_id == Orders.order_id,
+    )
+    db.session.execute(db.insert(SalesEvents).from_select(
+        ['user_id', 'order_id', 'client_id', 'product_id', 'day', 'units', 'revenue', 'created_at'],
+        for_user(
+            db.select(Orders.user_id, Orders.order_id, Orders.client_id, OrderItems.product_id,
+                      db.func.date(Orders.date), db.func.sum(OrderItems.quantity), db.func.sum(_line_revenue()),
+                      db.func.current_timestamp())
+            .join(OrderItems, OrderItems.order_id == Orders.order_id)
+            .where(Orders.status == 'completed', ~db.exists(booked))
+            .group_by(Orders.user_id, Orders.order_id, Orders.client_id, OrderItems.product_id, Orders.date),
+            Orders,
+        ),
+    ))
+
+    for model in (DailyRevenue, DailyProductSales, DailyClientSales, MonthlyProductSales, MonthlyClientSales):
+        db.session.execute(for_user(db.delete(model), model))
+
+    # net sales of each order per day; an order counts as sold on the days it has units left
+    per_order = for_user(
+        db.select(SalesEvents.user_id, SalesEvents.day, SalesEvents.order_id, SalesEvents.client_id,
+                  db.func.sum(SalesEvents.units).label('units'), db.func.sum(SalesEvents.revenue).label('revenue'))
+        .group_by(SalesEvents.user_id, SalesEvents.day, SalesEvents.order_id, SalesEvents.client_id),
+        SalesEvents,
+    ).subquery()
+    sold = db.func.sum(db.case((per_order.c.units > 0, 1), else_=0))
+
+    db.session.execute(db.insert(DailyRevenue).from_select(
+        ['user_id', 'day', 'orders', 'revenue'],
+        db.select(per_order.c.user_id, per_order.c.day, sold, db.func.sum(per_order.c.revenue))
+        .group_by(per_order.c.user_id, per_order.c.day),
+    ))
+    db.session.execute(db.insert(DailyClientSales).from_select(
+        ['user_id', 'day', 'client_id', 'orders', 'revenue'],
+        db.select(per_order.c.user_id, per_order.c.day, per_order.c.client_id, sold, db.func.sum(per_order.c.revenue))
+        .where(per_order.c.client_id.is_not(None))
+        .group_by(per_order.c.user_id, per_order.c.day, per_order.c.client_id),
+    ))
+    db.session.execute(db.insert(DailyProductSales).from_select(
+        ['user_id', 'day', 'product_id', 'units', 'revenue'],
+        for_user(
+            db.select(SalesEvents.user_id, SalesEvents.day, SalesEvents.product_id,
+                      db.func.sum(SalesEvents.units), db.func.sum(SalesEvents.revenue))
+            .where(SalesEvents.product_id.is_not(None))
+            .group_by(SalesEvents.user_id, SalesEvents.day, SalesEvents.product_id),
+            SalesEvents,
+        ),
+    ))
+
+    # the monthly rollups add up the daily ones
+    for daily, monthly, key, count in (
+        (DailyProductSales, MonthlyProductSales, 'product_id', 'units'),
+        (DailyClientSales, MonthlyClientSales, 'client_id', 'orders'),
+    ):
+        year, month = db.extract('year', daily.day), db.extract('month', daily.day)
+        db.session.execute(db.insert(monthly).from_select(
+            ['user_id', 'year', 'month', key, count, 'revenue'],
+            for_user(
+                db.select(daily.user_id, year, month, getattr(daily, key),
+                          db.func.sum(getattr(daily, count)), db.func.sum(daily.revenue))
+                .group_by(daily.user_id, year, month, getattr(daily, key)),
+                daily,
+            ),
+        ))
+
+# command line entry point: flask rebuild-sales-rollups [--user-id ID]
+@click.command('rebuild-sales-rollups')
+@click.option('--user-id', type=int, default=None, help='Only rebuild the rollups of this user.')
+@with_appcontext
+def rebuild_sales_rollups_command(user_id):
+    rebuild_sales_rollups(user_id)
+    db.session.commit()
+    click.echo('Sales rollups rebuilt')
@@ -22,6 +22,8 @@ class OrderItemSchema(SQLAlchemyAutoSchema):
         model = OrderItems
         include_relationships = True
         load_instance = True
+        # the copied price is served as 'price'
+        exclude = ('unit_price',)
 
     order_item_id = fields.Int(dump_only=True)
     order_id = fields.Int(dump_only=True)
@@ -34,16 +36,16 @@ class OrderItemSchema(SQLAlchemyAutoSchema):
     product_color = fields.Method("get_product_color", dump_only=True)
 
     def get_price(self, obj):
-        return obj.product.price if obj.product else None
+        return obj.product_details()[0]
 
     def get_product_name(self, obj):
-        return obj.product.name if obj.product else None
+        return obj.product_details()[1]
 
     def get_product_size(self, obj):
-        return obj.product.size if obj.product else None
+        return obj.product_details()[2]
 
     def get_product_color(self, obj):
-        return obj.product.color if obj.product else None
+        return obj.product_details()[3]
 
 class OrderSchema(SQLAlchemyAutoSchema):
     class Meta:
@@ -65,4 +67,38 @@ class OrderSchema(SQLAlchemyAutoSchema):
         return obj.user.name if obj.user else None
 
     def get_client_name(self, obj):
-        return obj.client.name if obj.client else None
\ No newline at end of file
+        return obj.client.name if obj.client else None
+
+# lightweight serializers for eager-loaded orders, producing the same output
+# as OrderSchema/OrderItemSchema without marshmallow's per-field callbacks
+def dump_order_item(item):
+    price, name, size, color = item.product_details()
+    return {
+        "order_item_id": item.order_item_id,
+        "order_id": item.order_id,
+        "orders": item.order_id,
+        "user_id": item.user_id,
+        "user": item.user_id,
+        "product_id": item.product_id,
+        "product": item.product_id,
+        "quantity": item.quantity,
+        "price": price,
+        "product_name": name,
+        "product_size": size,
+        "product_color": color,
+    }
+
+def dump_order(order):
+    return {
+        "order_id": order.order_id,
+        "client_id": order.client_id,
+        "client": order.client_id,
+        "user_id": order.user_id,
+        "user": order.user_id,
+        "user_name": order.user.name if order.user else None,
+        "client_name": order.client.name if order.client else None,
+        "date": order.date.isoformat() if order.date else None,
+        "status": order.status,
+        "items": [dump_order_item(item) for item in order.items],
+        "total_price": float(order.total_price) if order.total_price is not None else None,
+    }
@@ -0,0 +1,222 @@
+from flask import jsonify, request
+from flask.cli import with_appcontext
+from sqlalchemy import DDL, event, text
+from .models import Products, Clients
+from .extensions import db
+from .pagination import page_args
+from collections.abc import Mapping
+import click
+import re
+
+# columns searched for each kind of record
+SEARCH_COLUMNS = {
+    'products': ['name', 'color', 'size', 'description'],
+    'clients': ['name', 'email', 'phone_number'],
+}
+
+# models and primary keys of the searchable tables
+SEARCH_MODELS = {
+    'products': (Products, 'product_id'),
+    'clients': (Clients, 'client_id'),
+}
+
+# results returned per page when the client does not ask for a limit
+DEFAULT_SEARCH_LIMIT = 50
+
+# most matches ranked by relevance for a single SQLite search
+MAX_RANKED_MATCHES = 2000
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+# SQLite: one FTS5 table per searchable table, whose rowid is the record's primary key;
+# prefix indexes keep search-as-you-type queries fast on large catalogs
+def _fts_ddl(table):
+    columns = ', '.join(SEARCH_COLUMNS[table])
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5("
+        f"{columns}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+
+# PostgreSQL: a trigram GIN index over the concatenated searchable columns
+def _search_text_sql(table):
+    return " || ' ' || ".join(f"coalesce({column}, '')" for column in SEARCH_COLUMNS[table])
+
+def _trigram_ddl(table):
+    return (
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_search_trgm ON {table} "
+        f"USING gin (({_search_text_sql(table)}) gin_trgm_ops)"
+    )
+
+# creates the search structures together with their tables (db.create_all)
+for _table, (_model, _) in SEARCH_MODELS.items():
+    event.listen(_model.__table__, 'after_create', DDL(_fts_ddl(_table)).execute_if(dialect='sqlite'))
+    event.listen(_model.__table__, 'after_create', DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+    event.listen(_model.__table__, 'after_create', DDL(_trigram_ddl(_table)).execute_if(dialect='postgresql'))
+    event.listen(_model.__table__, 'before_drop', DDL(f'DROP TABLE IF EXISTS {_table}_fts').execute_if(dialect='sqlite'))
+
+# true for the SQLite index tables (and the shadow tables FTS5 keeps for them),
+# which the app builds itself and database migrations must leave alone
+def is_search_table(name):
+    return re.fullmatch(rf"({'|'.join(SEARCH_MODELS)})_fts(_\w+)?", name) is not None
+
+# Alembic filter keeping the search index out of autogenerated migrations
+def include_in_migrations(name, type_, parent_names):
+    return not (type_ == 'table' and is_search_table(name))
+
+# splits a search string into words, ignoring punctuation and search operators
+def search_terms(query):
+    return re.findall(r'\w+', query or '')
+
+# writes the searchable columns of the given records (mappings or model objects) into the
+# SQLite index; on other databases the index is maintained by the database itself
+def index_records(table, records):
+    if _dialect() != 'sqlite' or not records:
+        return
+
+    _, key = SEARCH_MODELS[table]
+    columns = SEARCH_COLUMNS[table]
+
+    def values(record):
+        get = record.get if isinstance(record, Mapping) else lambda name: getattr(record, name)
+        return {'rowid': get(key), **{column: get(column) for column in columns}}
+
+    rows = [values(record) for record in records]
+    db.session.execute(text(f"DELETE FROM {table}_fts WHERE rowid = :rowid"), [{'rowid': row['rowid']} for row in rows])
+    db.session.execute(
+        text(f"INSERT INTO {table}_fts (rowid, {', '.join(columns)}) VALUES (:rowid, {', '.join(':' + c for c in columns)})"),
+        rows,
+    )
+
+# removes records from the SQLite index
+def unindex_records(table, record_ids):
+    if _dialect() != 'sqlite' or not record_ids:
+        return
+    db.session.execute(text(f"DELETE FROM {table}_fts WHERE rowid = :rowid"), [{'rowid': record_id} for record_id in record_ids])
+
+# returns the IDs of the user's records matching every word of the query, best matches first
+def search_ids(table, user_id, query, limit, offset):
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    model, key = SEARCH_MODELS[table]
+    key_column = getattr(model, key)
+    dialect = _dialect()
+
+    if dialect == 'sqlite':
+        # every word must match the start of a token; bm25 ranks the user's newest
+        # MAX_RANKED_MATCHES matches, since ranking costs time for every match and
+        # very broad queries can match most of a catalog; older matches follow
+        # them, newest first, so every match can still be reached by paging
+        match = ' '.join(f'"{term}"*' for term in terms)
+        matches = (
+            f"FROM {table}_fts JOIN {table} ON {table}.{key} = {table}_fts.rowid "
+            f"WHERE {table}_fts MATCH :match AND {table}.user_id = :user_id"
+        )
+        statement = text(
+            f"WITH ranked_from AS (SELECT coalesce(("
+            f"SELECT {table}_fts.rowid {matches} ORDER BY {table}_fts.rowid DESC LIMIT 1 OFFSET :window"
+            f"), 0) AS rowid) "
+            f"SELECT rowid FROM ("
+            f"SELECT {table}_fts.rowid AS rowid, 0 AS tier, {table}_fts.rank AS score {matches} "
+            f"AND {table}_fts.rowid >= (SELECT rowid FROM ranked_from) "
+            f"UNION ALL "
+            f"SELECT {table}_fts.rowid, 1, -{table}_fts.rowid {matches} "
+            f"AND {table}_fts.rowid < (SELECT rowid FROM ranked_from)"
+            f") ORDER BY tier, score, rowid LIMIT :limit OFFSET :offset"
+        )
+        params = {'match': match, 'user_id': user_id, 'window': MAX_RANKED_MATCHES, 'limit': limit, 'offset': offset}
+        return db.session.execute(statement, params).scalars().all()
+
+    if dialect == 'postgresql':
+        # substring matches served by the trigram index, ranked by similarity
+        search_text = db.literal_column(f"({_search_text_sql(table)})")
+        statement = (
+            db.select(key_column)
+            .where(model.user_id == user_id, *(
+                search_text.ilike('%' + term.replace('_', '\\_') + '%', escape='\\') for term in terms
+            ))
+            .order_by(db.func.similarity(search_text, ' '.join(terms)).desc(), key_column)
+            .limit(limit).offset(offset)
+        )
+        return db.session.execute(statement).scalars().all()
+
+    # other databases: unindexed substring match on the searchable columns
+    statement = (
+        db.select(key_column)
+        .where(model.user_id == user_id, *(
+            db.or_(*(getattr(model, column).contains(term, autoescape=True) for column in SEARCH_COLUMNS[table]))
+            for term in terms
+        ))
+        .order_by(key_column)
+        .limit(limit).offset(offset)
+    )
+    return db.session.execute(statement).scalars().all()
+
+# loads the records for a page of search results, keeping the ranked order, and
+# tells whether there are more results after them
+def search_records(table, user_id, query, limit, offset):
+    model, key = SEARCH_MODELS[table]
+    ids = search_ids(table, user_id, query, limit + 1, offset)
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+
+    records = {getattr(record, key): record for record in model.query.filter(getattr(model, key).in_(ids))} if ids else {}
+    return [records[record_id] for record_id in ids if record_id in records], has_more
+
+# answers a search request: 'q' holds the search words, 'limit' the page size and
+# 'cursor' the offset of the page, as returned in 'next_cursor'; raises ValueError
+# if the parameters are invalid
+def search_page(table, user_id, serialize):
+    query = request.args.get('q', '')
+    if not search_terms(query):
+        raise ValueError("Please enter a search term")
+
+    limit, offset = page_args()
+    if offset is not None and offset < 0:
+        raise ValueError("Invalid cursor")
+    limit = limit or DEFAULT_SEARCH_LIMIT
+    offset = offset or 0
+
+    records, has_more = search_records(table, user_id, query, limit, offset)
+    return jsonify(items=serialize(records), next_cursor=offset + limit if has_more else None)
+
+# rebuilds the search index from the tables, creating it if it does not exist yet
+def rebuild_search_index():
+    dialect = _dialect()
+    for table, (_, key) in SEARCH_MODELS.items():
+        if dialect == 'sqlite':
+            columns = ', '.join(SEARCH_COLUMNS[table])
+            db.session.execute(text(_fts_ddl(table)))
+            db.session.execute(text(f"DELETE FROM {table}_fts"))
+            db.session.execute(text(
+                f"INSERT INTO {table}_fts (rowid, {columns}) SELECT {key}, {columns} FROM {table}"
+            ))
+            db.session.execute(text(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('optimize')"))
+        elif dialect == 'postgresql':
+            db.session.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            db.session.execute(text(_trigram_ddl(table)))
+
+# builds the SQLite search index of databases created before it existed; the
+# tables themselves may not exist yet, in which case db.create_all adds the index
+def ensure_search_index(engine):
+    if engine.dialect.name != 'sqlite':
+        return
+
+    with engine.begin() as connection:
+        existing = set(connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars())
+        for table, (_, key) in SEARCH_MODELS.items():
+            if table not in existing or f'{table}_fts' in existing:
+                continue
+            columns = ', '.join(SEARCH_COLUMNS[table])
+            connection.execute(text(_fts_ddl(table)))
+            connection.execute(text(f"INSERT INTO {table}_fts (rowid, {columns}) SELECT {key}, {columns} FROM {table}"))
+
+# command line entry point: flask rebuild-search-index
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    rebuild_search_index()
+    db.session.commit()
+    click.echo('Search index rebuilt')
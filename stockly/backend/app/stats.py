@@ -0,0 +1,88 @@
+from flask.cli import with_appcontext
+from .models import Users, Products, Clients, Orders, UserStats
+from .extensions import db
+from .cache import mark_user_written
+import click
+import uuid
+
+# builds the query that recomputes the counters of every user (or a single one) from scratch
+def _recomputed_stats(user_id=None):
+    total_products = (
+        db.select(db.func.count(Products.product_id))
+        .where(Products.user_id == Users.user_id)
+        .scalar_subquery()
+    )
+    total_stock = (
+        db.select(db.func.coalesce(db.func.sum(Products.quantity), 0))
+        .where(Products.user_id == Users.user_id)
+        .scalar_subquery()
+    )
+    pending_orders = (
+        db.select(db.func.count(Orders.order_id))
+        .where(Orders.user_id == Users.user_id, Orders.status == 'pending')
+        .scalar_subquery()
+    )
+    total_clients = (
+        db.select(db.func.count(Clients.client_id))
+        .where(Clients.user_id == Users.user_id)
+        .scalar_subquery()
+    )
+
+    query = db.select(
+        Users.user_id, total_products, total_stock, pending_orders, total_clients,
+        db.literal(uuid.uuid4().hex),
+    )
+    if user_id is not None:
+        query = query.where(Users.user_id == user_id)
+    return query
+
+# rebuilds the user_stats rows from the products, orders and clients tables
+#
+# runs inside the caller's transaction; pass a user ID to rebuild a single user
+def reconcile_user_stats(user_id=None):
+    delete = db.delete(UserStats)
+    if user_id is not None:
+        delete = delete.where(UserStats.user_id == user_id)
+    db.session.execute(delete)
+
+    db.session.execute(
+        db.insert(UserStats).from_select(
+            ['user_id', 'total_products', 'total_stock', 'pending_orders', 'total_clients', 'data_version'],
+            _recomputed_stats(user_id),
+        )
+    )
+
+# applies counter deltas for a user with a single SQL-side UPDATE
+#
+# runs inside the caller's transaction, so the counters commit (or roll back)
+# together with the write that changed them
+def bump_user_stats(user_id, products=0, stock=0, pending=0, clients=0):
+    if not (products or stock or pending or clients):
+        return
+
+    mark_user_written(user_id)
+    result = db.session.execute(
+        db.update(UserStats)
+        .where(UserStats.user_id == user_id)
+        .values(
+            total_products=UserStats.total_products + products,
+            total_stock=UserStats.total_stock + stock,
+            pending_orders=UserStats.pending_orders + pending,
+            total_clients=UserStats.total_clients + clients,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    # users created before the counters existed get their row built on first write
+    if result.rowcount == 0:
+        db.session.flush()
+        reconcile_user_stats(user_id)
+
+# command line entry point: flask reconcile-stats [--user-id ID]
+@click.command('reconcile-stats')
+@click.option('--user-id', type=int, default=None, help='Only rebuild the counters of this user.')
+@with_appcontext
+def reconcile_stats_command(user_id):
+    reconcile_user_stats(user_id)
+    db.session.commit()
+    click.echo('User stats reconciled')
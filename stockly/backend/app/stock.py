@@ -0,0 +1,66 @@
+from .models import Products
+from .extensions import db
+from .stats import bump_user_stats
+
+# raised when an order asks for more units of a product than are in stock
+class InsufficientStock(Exception):
+    def __init__(self, product_id):
+        super().__init__(f"Insufficient stock for product {product_id}")
+        self.product_id = product_id
+
+# adds up item quantities per product
+def quantities_by_product(items):
+    quantities = {}
+    for product_id, quantity in items:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+# takes units out of stock with conditional UPDATEs, so concurrent orders can never
+# drive a product below zero; raises InsufficientStock, leaving the caller to roll back
+def reserve_stock(user_id, quantities):
+    # products are updated in a fixed order so concurrent reservations cannot deadlock
+    for product_id, quantity in sorted(quantities.items()):
+        if quantity <= 0:
+            continue
+        result = db.session.execute(
+            db.update(Products)
+            .where(Products.product_id == product_id, Products.user_id == user_id, Products.quantity >= quantity)
+            .values(quantity=Products.quantity - quantity)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            raise InsufficientStock(product_id)
+
+    bump_user_stats(user_id, stock=-sum(quantity for quantity in quantities.values() if quantity > 0))
+
+# puts units back into stock
+def release_stock(user_id, quantities):
+    released = 0
+    for product_id, quantity in sorted(quantities.items()):
+        if quantity <= 0:
+            continue
+        result = db.session.execute(
+            db.update(Products)
+            .where(Products.product_id == product_id, Products.user_id == user_id)
+            .values(quantity=Products.quantity + quantity)
+            .execution_options(synchronize_session=False)
+        )
+        # products deleted since the order was placed have no stock to return to
+        if result.rowcount == 1:
+            released += quantity
+
+    bump_user_stats(user_id, stock=released)
+
+# applies the difference between an order's old and new item quantities to stock;
+# raises ValueError for quantities below one, which would otherwise put units back
+def adjust_stock(user_id, old_quantities, new_quantities):
+    if any(quantity < 1 for quantity in new_quantities.values()):
+        raise ValueError("Order quantities must be positive whole numbers")
+
+    product_ids = set(old_quantities) | set(new_quantities)
+    delta = {
+        product_id: new_quantities.get(product_id, 0) - old_quantities.get(product_id, 0)
+        for product_id in product_ids
+    }
+    release_stock(user_id, {product_id: -change for product_id, change in delta.items() if change < 0})
+    reserve_stock(user_id, {product_id: change for product_id, change in delta.items() if change > 0})
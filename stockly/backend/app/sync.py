@@ -0,0 +1,87 @@
+from flask import current_app
+from flask.cli import with_appcontext
+from .models import Products, Clients, Orders, OrderItems, Tombstones
+from .extensions import db
+from .cache import mark_user_written
+from datetime import datetime, timedelta, timezone
+import click
+
+# models whose rows are synced, by the name used in sync responses and tombstones
+SYNC_MODELS = {'products': Products, 'clients': Clients, 'orders': Orders}
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# sync tokens are the time a sync started, in microseconds since the epoch
+def sync_token(moment):
+    return str((moment - datetime(1970, 1, 1)) // timedelta(microseconds=1))
+
+# reads a sync token back into a time, raising ValueError if it is not one
+def parse_sync_token(token):
+    if not token.isdigit():
+        raise ValueError("since must be a token returned by a previous sync")
+    return datetime(1970, 1, 1) + timedelta(microseconds=int(token))
+
+# records the deletion of some of a user's products, clients or orders
+def record_deletions(user_id, entity, entity_ids):
+    if not entity_ids:
+        return
+    mark_user_written(user_id)
+    now = _utcnow()
+    db.session.execute(db.insert(Tombstones), [
+        {'user_id': user_id, 'entity': entity, 'entity_id': entity_id, 'deleted_at': now}
+        for entity_id in entity_ids
+    ])
+
+# moves the updated_at of a user's orders matching 'criteria' forward, for changes
+# that alter how an order is served without writing its row (its items, or the
+# client and user names it carries)
+def touch_orders(user_id, *criteria):
+    mark_user_written(user_id)
+    db.session.execute(
+        db.update(Orders)
+        .where(Orders.user_id == user_id, *criteria)
+        .values(updated_at=_utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+# orders with a line for the given product
+def ordering_product(product_id):
+    return Orders.order_id.in_(db.select(OrderItems.order_id).where(OrderItems.product_id == product_id))
+
+# returns the filters selecting the user's rows written since 'since', per model,
+# and the IDs deleted since then; with no 'since', or one older than the tombstones
+# are kept for, the filters select every row and 'deleted' is None, telling the
+# client to replace what it has
+#
+# 'since' is moved back by SYNC_OVERLAP_SECONDS, so rows written by transactions
+# that were still open when the previous sync read are sent again rather than
+# missed; clients apply the deletions first, then upsert the rows
+def changes_since(user_id, since):
+    if since is not None:
+        since -= timedelta(seconds=current_app.config['SYNC_OVERLAP_SECONDS'])
+    oldest = _utcnow() - timedelta(days=current_app.config['SYNC_TOMBSTONE_DAYS'])
+    if since is None or since < oldest:
+        return {entity: [] for entity in SYNC_MODELS}, None
+
+    filters = {entity: [model.updated_at >= since] for entity, model in SYNC_MODELS.items()}
+    deleted = {entity: [] for entity in SYNC_MODELS}
+    rows = db.session.execute(
+        db.select(Tombstones.entity, Tombstones.entity_id)
+        .where(Tombstones.user_id == user_id, Tombstones.deleted_at >= since)
+        .order_by(Tombstones.tombstone_id)
+    ).all()
+    for entity, entity_id in rows:
+        deleted[entity].append(entity_id)
+    return filters, deleted
+
+# command line entry point: flask prune-tombstones
+#
+# removes the tombstones older than SYNC_TOMBSTONE_DAYS, which no delta sync reads
+@click.command('prune-tombstones')
+@with_appcontext
+def prune_tombstones_command():
+    oldest = _utcnow() - timedelta(days=current_app.config['SYNC_TOMBSTONE_DAYS'])
+    result = db.session.execute(db.delete(Tombstones).where(Tombstones.deleted_at < oldest))
+    db.session.commit()
+    click.echo(f'{result.rowcount} tombstones pruned')
@@ -0,0 +1,30 @@
+from flask_jwt_extended import JWTManager
+import time
+
+# JWT manager that remembers the claims of tokens it has already verified
+#
+# a client sends the same token with every request, so its signature only needs
+# checking once; cached claims are used until the token expires, after which it
+# goes through the normal verification (and its expiry error) again
+#
+# flask-jwt-extended has no public hook that can skip the verification, so this
+# overrides the private method every decode goes through (decode_token and the
+# jwt_required views alike); the library is pinned in requirements.txt and
+# tests/test_tokens.py fails if an upgrade stops calling it
+class CachingJWTManager(JWTManager):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # set in create_app; None disables the cache
+        self.claims_cache = None
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if self.claims_cache is None or csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        claims = self.claims_cache.get(encoded_token)
+        if claims is not None and claims.get('exp', float('inf')) > time.time():
+            return claims
+
+        claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        self.claims_cache.set(encoded_token, claims)
+        return claims
@@ -0,0 +1,47 @@
+# gunicorn settings for running the API in production
+#
+#   gunicorn -c gunicorn.conf.py "app:create_app()"
+#
+# every value can be overridden from the environment; send SIGHUP to the master
+# process for a graceful reload (with preload enabled, new code is only picked
+# up by a full restart)
+import multiprocessing
+import os
+
+def env_flag(name, default):
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+# address to listen on
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+
+# worker processes and threads per worker; the app mostly waits on the database,
+# so a couple of threads per process keeps the CPU busy without extra memory;
+# every open /events stream holds a thread of its own, so each process gets
+# EVENTS_MAX_STREAMS more, which sit idle waiting for events most of the time
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+event_streams = int(os.getenv('EVENTS_MAX_STREAMS', 16))
+threads = int(os.getenv('GUNICORN_THREADS', 2)) + event_streams
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# tells the app how many processes and stream threads it runs with, which
+# decide how it publishes events (see EVENTS_BACKEND in app/config.py)
+os.environ['WEB_CONCURRENCY'] = str(workers)
+os.environ['EVENTS_MAX_STREAMS'] = str(event_streams)
+
+# load the app once in the master so workers fork with it already imported
+preload_app = env_flag('GUNICORN_PRELOAD', True)
+
+# keep idle client connections open briefly so clients can reuse them
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# time limits for requests and for workers finishing in-flight requests on reload/shutdown
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# recycle workers periodically, with jitter so they do not all restart at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# log requests and errors to stdout/stderr
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
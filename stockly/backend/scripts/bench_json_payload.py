@@ -0,0 +1,91 @@
+# JSON encoding and compression benchmark for large list payloads
+#
+# builds a list of orders shaped like the GET /orders response, encodes it with
+# each available JSON provider and compresses the result with each available
+# encoding, printing the encode times and the bytes that would go on the wire
+#
+# usage: python scripts/bench_json_payload.py [--orders 10000] [--items 3] [--repeat 5]
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def sample_orders(count, items_per_order):
+    start = datetime(2024, 1, 1)
+    orders = []
+    for order_id in range(1, count + 1):
+        items = [
+            {
+                'order_item_id': order_id * items_per_order + index,
+                'order_id': order_id, 'orders': order_id,
+                'user_id': 1, 'user': 1,
+                'product_id': index + 1, 'product': index + 1,
+                'quantity': index + 1,
+                'price': 19.9 + index,
+                'product_name': f'Product {index + 1}',
+                'product_size': 'M',
+                'product_color': 'Blue',
+            }
+            for index in range(items_per_order)
+        ]
+        orders.append({
+            'order_id': order_id,
+            'client_id': order_id % 50 + 1, 'client': order_id % 50 + 1,
+            'user_id': 1, 'user': 1,
+            'user_name': 'Bench User',
+            'client_name': f'Client {order_id % 50 + 1}',
+            'date': (start + timedelta(minutes=order_id)).isoformat(),
+            'status': 'pending' if order_id % 3 else 'completed',
+            'items': items,
+            'total_price': sum(item['price'] * item['quantity'] for item in items),
+        })
+    return orders
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--items', type=int, default=3, help='items per order')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement, the best is reported')
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    from flask import Flask
+    from app.json_provider import JSON_PROVIDERS, orjson
+    from app.compression import Compressor
+
+    app = Flask(__name__)
+    orders = sample_orders(args.orders, args.items)
+    compressor = Compressor()
+
+    print(f"{args.orders} orders with {args.items} items each\n")
+    print(f"{'provider':<10} {'encode ms':>10}")
+    body = None
+    for name, provider_class in JSON_PROVIDERS.items():
+        if name == 'orjson' and orjson is None:
+            print(f"{name:<10} {'not installed':>10}")
+            continue
+        provider = provider_class(app)
+        seconds, response = best_time(lambda: provider.response(orders).get_data(), args.repeat)
+        body = body or response
+        print(f"{name:<10} {seconds * 1000:>10.1f}")
+
+    print(f"\n{'encoding':<10} {'bytes':>12} {'ratio':>7} {'compress ms':>12}")
+    print(f"{'identity':<10} {len(body):>12} {1:>7.2f} {0:>12.1f}")
+    for encoding in compressor.encodings():
+        seconds, compressed = best_time(lambda: compressor.compress(body, encoding), args.repeat)
+        print(f"{encoding:<10} {len(compressed):>12} {len(body) / len(compressed):>7.2f} {seconds * 1000:>12.1f}")
+
+if __name__ == '__main__':
+    main()
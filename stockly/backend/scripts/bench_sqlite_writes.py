@@ -0,0 +1,78 @@
+# concurrent-write benchmark for the SQLite settings
+#
+# runs the same workload (threads registering products, optionally alongside
+# threads reading the dashboard) against a fresh SQLite file with SQLITE_TUNED
+# off and on, and prints the throughput and the number of failed requests
+#
+# usage: python scripts/bench_sqlite_writes.py [--writers 8] [--readers 0] [--requests 200]
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def run_workload(writers, readers, requests):
+    sys.path.insert(0, BACKEND_DIR)
+    from app import create_app
+    from app.extensions import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+
+    client = app.test_client()
+    client.post('/register', json=dict(name='Bench', email='bench@example.com', password='bench', confirm_password='bench'))
+    token = client.post('/login', json=dict(email='bench@example.com', password='bench')).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    product = dict(name='Product', color='', size='', dimensions='', price=1.0, description='', quantity=1)
+
+    def worker(index):
+        failures = 0
+        worker_client = app.test_client()
+        for _ in range(requests):
+            if index >= writers:
+                response = worker_client.get('/', headers=headers)
+            else:
+                response = worker_client.post('/products/register-product', json=product, headers=headers)
+            failures += response.status_code >= 500
+        return failures
+
+    app.testing = False
+    start = time.perf_counter()
+    with ThreadPoolExecutor(writers + readers) as executor:
+        failures = sum(executor.map(worker, range(writers + readers)))
+    elapsed = time.perf_counter() - start
+
+    total = (writers + readers) * requests
+    print(f"SQLITE_TUNED={os.environ['SQLITE_TUNED']}: {total / elapsed:8.1f} req/s, {failures} failed of {total}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writers', type=int, default=8, help='threads registering products')
+    parser.add_argument('--readers', type=int, default=0, help='threads reading the dashboard')
+    parser.add_argument('--requests', type=int, default=200, help='requests per thread')
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_workload(args.writers, args.readers, args.requests)
+        return
+
+    # each mode runs in its own process so the config is read from a clean environment
+    for tuned in ('0', '1'):
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, SQLITE_TUNED=tuned, DATABASE_URL=f"sqlite:///{os.path.join(directory, 'bench.db')}")
+            subprocess.run(
+                [
+                    sys.executable, __file__, '--run', '--writers', str(args.writers),
+                    '--readers', str(args.readers), '--requests', str(args.requests),
+                ],
+                env=env, check=True,
+            )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# load test comparing the Flask development server with gunicorn
+#
+# starts each server in turn against a fresh SQLite database, seeds a user with
+# some products, then has several client threads call the dashboard and the
+# product list over keep-alive connections for a fixed time, printing the
+# requests per second and latency percentiles of each server
+#
+# usage: python scripts/load_test.py [--clients 16] [--duration 10] [--servers dev gunicorn]
+#
+# gunicorn takes its settings from gunicorn.conf.py and the environment, e.g.
+#   WEB_CONCURRENCY=4 GUNICORN_THREADS=4 python scripts/load_test.py
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+SERVERS = {
+    'dev': [sys.executable, 'app.py'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:create_app()'],
+}
+
+def request(connection, method, path, body=None, headers=None):
+    headers = dict(headers or {})
+    if body is not None:
+        body = json.dumps(body)
+        headers['Content-Type'] = 'application/json'
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    data = response.read()
+    return response.status, data
+
+def wait_for_server(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            request(connection, 'GET', '/products')
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+def seed(port, products):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    request(connection, 'POST', '/register', dict(name='Load', email='load@example.com', password='load', confirm_password='load'))
+    _, data = request(connection, 'POST', '/login', dict(email='load@example.com', password='load'))
+    headers = {'Authorization': f"Bearer {json.loads(data)['access_token']}"}
+    for index in range(products):
+        product = dict(name=f'Product {index}', color='', size='', dimensions='', price=1.0, description='', quantity=10)
+        request(connection, 'POST', '/products/register-product', product, headers)
+    return headers
+
+def hammer(port, headers, clients, duration):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        local = []
+        failed = 0
+        paths = ['/', '/products']
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                status, _ = request(connection, 'GET', paths[len(local) % 2], headers=headers)
+                failed += status != 200
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection = http.client.HTTPConnection('127.0.0.1', port)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    return len(latencies) / duration, percentile(0.5), percentile(0.99), sum(errors)
+
+def run(server, args, port):
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, PORT=str(port), DATABASE_URL=f"sqlite:///{os.path.join(directory, 'load.db')}")
+
+        # creates the tables in a separate process so the config sees this environment
+        subprocess.run(
+            [sys.executable, '-c', 'from app import create_app\nfrom app.extensions import db\napp = create_app()\nwith app.app_context(): db.create_all()'],
+            cwd=BACKEND_DIR, env=env, check=True,
+        )
+
+        process = subprocess.Popen(SERVERS[server], cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_server(port)
+            headers = seed(port, args.products)
+            rps, p50, p99, errors = hammer(port, headers, args.clients, args.duration)
+            print(f"{server:>8}: {rps:8.1f} req/s   p50 {p50:7.1f} ms   p99 {p99:7.1f} ms   {errors} errors")
+        finally:
+            process.terminate()
+            process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the dev server and gunicorn under load.')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent client connections')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load per server')
+    parser.add_argument('--products', type=int, default=50, help='products seeded before the test')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+    args = parser.parse_args()
+
+    for server in args.servers:
+        run(server, args, args.port)
+
+if __name__ == '__main__':
+    main()
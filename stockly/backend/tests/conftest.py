@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import event
+from app.extensions import db
+from app.models import Clients, Products
+from support import make_app, register
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path / 'stockly.db')
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+# headers of a registered user's requests
+@pytest.fixture
+def headers(client):
+    _, headers = register(client)
+    return headers
+
+# adds a client and products for the logged-in user through the API, returning
+# the client's ID and the products' IDs
+@pytest.fixture
+def catalog(app, client, headers):
+    def create(products=1, quantity=100, price=10.0):
+        client.post('/clients/register-client', json={'name': 'Client', 'phone_number': '555', 'email': 'client@example.com'}, headers=headers)
+        for number in range(products):
+            client.post('/products/register-product', json={
+                'name': f'Product {number}', 'color': 'blue', 'size': 'M', 'dimensions': '', 'price': price,
+                'description': '', 'quantity': quantity,
+            }, headers=headers)
+        with app.app_context():
+            client_id = db.session.execute(db.select(db.func.max(Clients.client_id))).scalar()
+            product_ids = db.session.execute(db.select(Products.product_id).order_by(Products.product_id)).scalars().all()
+        return client_id, product_ids[-products:]
+    return create
+
+# gets a (statement, parameters) entry for every SQL statement the app runs;
+# tests clear it before the requests they count or inspect
+@pytest.fixture
+def statements(app):
+    executed = []
+    with app.app_context():
+        engine = db.engine
+    event.listen(
+        engine, 'before_cursor_execute',
+        lambda connection, cursor, statement, parameters, context, executemany: executed.append((statement, parameters)),
+    )
+    return executed
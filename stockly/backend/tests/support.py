@@ -0,0 +1,46 @@
+# helpers shared by the fixtures in conftest.py and the tests
+
+from app import create_app, identity, restock
+from app.config import engine_options
+from app.extensions import db
+from app.routes import dashboard
+
+# in-process caches keyed by user ID; every test has its own database, so they
+# are emptied whenever an app is made
+CACHES = (identity.token_cache, identity.user_cache, dashboard.dashboard_cache, restock.restock_cache)
+
+PASSWORD = 'secret'
+
+def clear_caches():
+    for cache in CACHES:
+        cache.clear()
+
+# makes an app on a fresh SQLite file, with its tables created; settings read
+# from the environment are replaced by ones that keep the tests fast and the
+# results independent of the machine running them
+def make_app(path, **config):
+    uri = f'sqlite:///{path}'
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLALCHEMY_ENGINE_OPTIONS': engine_options(uri),
+        'BCRYPT_LOG_ROUNDS': 4,
+        'LOGIN_RATE_LIMIT_PER_IP': 100000,
+        'LOGIN_RATE_LIMIT_PER_EMAIL': 100000,
+        'METRICS_ENABLED': True,
+        'METRICS_TOKEN': None,
+        'WEB_CONCURRENCY': 1,
+        'EVENTS_BACKEND': 'memory',
+        'EVENTS_STREAM_SECONDS': 0, # event streams end right away instead of staying open
+        **config,
+    })
+    with app.app_context():
+        db.create_all()
+    clear_caches()
+    return app
+
+# registers and logs in a user, returning their ID and the headers of their requests
+def register(client, email='owner@example.com'):
+    client.post('/register', json={'name': 'Owner', 'email': email, 'password': PASSWORD, 'confirm_password': PASSWORD})
+    login = client.post('/login', json={'email': email, 'password': PASSWORD}).get_json()
+    return login['user_id'], {'Authorization': f"Bearer {login['access_token']}"}
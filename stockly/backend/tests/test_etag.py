@@ -0,0 +1,40 @@
+from app.extensions import db
+from app.models import Products
+from support import register
+
+def refetch(client, path, response, headers):
+    return client.get(path, headers={**headers, 'If-None-Match': response.headers['ETag']})
+
+# an import that renames products without changing their stock still gives the
+# cached listings a new ETag
+def test_import_updates_change_the_etag(client, headers, catalog):
+    _, (product_id,) = catalog()
+    listings = {path: client.get(path, headers=headers) for path in ('/products', '/sync')}
+
+    response = client.post('/products/import?format=ndjson', data=(
+        f'{{"product_id": {product_id}, "name": "Renamed", "color": "blue", "size": "M", "dimensions": "", '
+        f'"price": 10.0, "description": "", "quantity": 100}}\n'
+    ), headers={**headers, 'Content-Type': 'application/x-ndjson'})
+    assert response.get_json()['updated'] == 1
+
+    for path, listing in listings.items():
+        response = refetch(client, path, listing, headers)
+        assert response.status_code == 200
+        assert 'Renamed' in response.get_data(as_text=True)
+
+# statements run through the session give the users they name a new ETag
+def test_session_statements_change_the_etag(app, client, headers, catalog):
+    catalog()
+    user_id, _ = register(client, 'other@example.com')
+    listing = client.get('/products', headers=headers)
+
+    with app.app_context():
+        db.session.execute(db.update(Products).where(Products.user_id == user_id).values(name='Other'))
+        db.session.commit()
+    assert refetch(client, '/products', listing, headers).status_code == 304
+
+    with app.app_context():
+        owner = db.session.execute(db.select(Products.user_id)).scalar()
+        db.session.execute(db.update(Products).where(Products.user_id == owner).values(name='Renamed'))
+        db.session.commit()
+    assert refetch(client, '/products', listing, headers).status_code == 200
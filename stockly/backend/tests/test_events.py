@@ -0,0 +1,67 @@
+import pytest
+import time
+from datetime import datetime
+from app.events import event_hub
+from app.extensions import db
+from app.models import StreamEvents
+from support import make_app
+
+@pytest.fixture
+def database_events(tmp_path):
+    app = make_app(
+        tmp_path / 'stockly.db', EVENTS_BACKEND='database', EVENTS_POLL_SECONDS=0.05, EVENTS_RETENTION_SECONDS=1,
+    )
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+def received(subscription):
+    return subscription.queue.get(timeout=5)
+
+def stream_event_ids(app):
+    with app.app_context():
+        return db.session.execute(db.select(StreamEvents.event_id).order_by(StreamEvents.event_id)).scalars().all()
+
+# the retention prune empties the table between the two events; the second one
+# must neither reuse the first one's ID nor be skipped by the poller
+def test_events_published_after_a_prune_are_delivered(database_events):
+    subscription = event_hub.subscribe(1)
+    try:
+        with database_events.app_context():
+            event_hub.publish(1, [{'event': 'first', 'data': {}}])
+            assert received(subscription) == [{'event': 'first', 'data': {}}]
+            first_id, = stream_event_ids(database_events)
+
+            deadline = time.monotonic() + 5
+            while stream_event_ids(database_events) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert stream_event_ids(database_events) == []
+
+            event_hub.publish(1, [{'event': 'second', 'data': {}}])
+            assert received(subscription) == [{'event': 'second', 'data': {}}]
+            assert all(event_id > first_id for event_id in stream_event_ids(database_events))
+    finally:
+        event_hub.unsubscribe(subscription)
+
+# a row that commits after one with a higher ID, as sequence values can on
+# PostgreSQL, is still delivered
+def test_events_committed_out_of_id_order_are_delivered(tmp_path):
+    app = make_app(tmp_path / 'stockly.db', EVENTS_BACKEND='database', EVENTS_POLL_SECONDS=0.05)
+    subscription = event_hub.subscribe(1)
+    try:
+        with app.app_context():
+            db.session.execute(db.insert(StreamEvents), [
+                {'event_id': 10, 'user_id': 1, 'payload': '[{"event": "later", "data": {}}]', 'created_at': datetime.utcnow()},
+            ])
+            db.session.commit()
+            assert received(subscription) == [{'event': 'later', 'data': {}}]
+
+            db.session.execute(db.insert(StreamEvents), [
+                {'event_id': 5, 'user_id': 1, 'payload': '[{"event": "earlier", "data": {}}]', 'created_at': datetime.utcnow()},
+            ])
+            db.session.commit()
+            assert received(subscription) == [{'event': 'earlier', 'data': {}}]
+    finally:
+        event_hub.unsubscribe(subscription)
+        with app.app_context():
+            db.engine.dispose()
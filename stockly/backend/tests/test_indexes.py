@@ -0,0 +1,51 @@
+import pytest
+from app.extensions import db
+from app.models import Clients
+from support import clear_caches, register
+
+# route calls, each with the index that should serve one of the statements it
+# runs; the paths are filled in with the IDs of the rows made for the test
+ROUTE_INDEXES = [
+    ('GET', '/products?limit=50&cursor={product_id}', 'ix_products_user_id_product_id'),
+    ('GET', '/clients?limit=50&cursor={client_id}', 'ix_clients_user_id_client_id'),
+    ('GET', '/orders?limit=50&cursor={order_id}', 'ix_orders_user_id_order_id'),
+    ('GET', '/orders?status=pending', 'ix_orders_user_id_status'),
+    ('GET', '/orders?from=2026-01-01', 'ix_orders_user_id_date'),
+    ('DELETE', '/clients/{unused_client_id}', 'ix_orders_client_id'),
+    ('GET', '/orders/details/{order_id}', 'ix_order_items_order_id'),
+    ('DELETE', '/products/{unused_product_id}', 'ix_order_items_product_id'),
+    ('DELETE', '/profile/{user_id}', 'ix_order_items_user_id'),
+]
+
+# the plan of every statement the app ran, as EXPLAIN QUERY PLAN details
+def query_plans(app, statements):
+    details = []
+    with app.app_context():
+        connection = db.session.connection()
+        for statement, parameters in statements:
+            if statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+                plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+                details.extend(row[-1] for row in plan)
+    return details
+
+@pytest.mark.parametrize('method, path, index', ROUTE_INDEXES, ids=[index for _, _, index in ROUTE_INDEXES])
+def test_route_searches_through_index(app, client, catalog, statements, method, path, index):
+    client_id, (product_id, unused_product_id) = catalog(products=2)
+    user_id, headers = register(client)
+    order = client.post('/orders/new-order', json={
+        'client_id': client_id, 'items': [{'product_id': product_id, 'quantity': 1}],
+    }, headers=headers).get_json()
+    client.post('/clients/register-client', json={'name': 'Unused', 'phone_number': '556', 'email': 'unused@example.com'}, headers=headers)
+    with app.app_context():
+        unused_client_id = db.session.execute(db.select(db.func.max(Clients.client_id))).scalar()
+
+    clear_caches()
+    statements.clear()
+    response = client.open(path.format(
+        user_id=user_id, client_id=client_id, unused_client_id=unused_client_id, product_id=product_id,
+        unused_product_id=unused_product_id, order_id=order['order_id'],
+    ), method=method, headers=headers)
+    assert response.status_code == 200
+
+    details = query_plans(app, statements)
+    assert any(f'INDEX {index} ' in detail for detail in details), details
@@ -0,0 +1,52 @@
+import pytest
+from datetime import datetime, timedelta
+from support import clear_caches
+
+# the order details are loaded with their lines in one joined query, however many there are
+def test_order_details_statements_do_not_grow_with_lines(client, headers, catalog, statements):
+    client_id, product_ids = catalog(products=30)
+    counts = []
+    for lines in (1, 30):
+        order = client.post('/orders/new-order', json={
+            'client_id': client_id, 'items': [{'product_id': product_id, 'quantity': 1} for product_id in product_ids[:lines]],
+        }, headers=headers).get_json()
+
+        clear_caches()
+        statements.clear()
+        response = client.get(f"/orders/details/{order['order_id']}", headers=headers)
+        assert response.status_code == 200
+        assert len(response.get_json()['items']) == lines
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]
+
+# a 'to' date without a time includes the orders of that whole day
+def test_orders_up_to_a_date_include_that_day(client, headers, catalog):
+    client_id, (product_id,) = catalog()
+    order = client.post('/orders/new-order', json={
+        'client_id': client_id, 'items': [{'product_id': product_id, 'quantity': 1}],
+    }, headers=headers).get_json()
+    today = datetime.utcnow().date()
+
+    def listed(query):
+        return [listed['order_id'] for listed in client.get(f'/orders?{query}', headers=headers).get_json()]
+
+    assert listed(f'to={today.isoformat()}') == [order['order_id']]
+    assert listed(f'from={today.isoformat()}&to={today.isoformat()}') == [order['order_id']]
+    assert listed(f'to={(today - timedelta(days=1)).isoformat()}') == []
+    assert listed(f'to={today.isoformat()}T00:00:00') == []
+
+# malformed items are refused per order, without failing the orders beside them
+@pytest.mark.parametrize('items', [5, 'items', {'product_id': 1}, [5], [None], [['product_id', 1]]])
+def test_bulk_orders_report_malformed_items(client, headers, catalog, items):
+    client_id, (product_id,) = catalog()
+    valid = {'client_id': client_id, 'items': [{'product_id': product_id, 'quantity': 1}]}
+
+    response = client.post('/orders/bulk', json={'orders': [valid, {'client_id': client_id, 'items': items}]}, headers=headers)
+    assert response.status_code == 201
+    body = response.get_json()
+    assert [created['index'] for created in body['created']] == [0]
+    assert [error['index'] for error in body['errors']] == [1]
+
+    response = client.post('/orders/new-order', json={'client_id': client_id, 'items': items}, headers=headers)
+    assert response.status_code == 400
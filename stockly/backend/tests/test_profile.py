@@ -0,0 +1,28 @@
+from sqlalchemy import event
+from app.extensions import db
+from app.models import Users
+from app.routes.profile import USER_RECORDS
+from support import register
+
+# deleting an account removes its ledgers, rollups and tombstones, so it also
+# succeeds where foreign keys are enforced, as on PostgreSQL
+def test_deleting_a_user_removes_their_records(app, client, catalog):
+    client_id, (product_id, deleted_product_id) = catalog(products=2)
+    user_id, headers = register(client)
+    order = client.post('/orders/new-order', json={
+        'client_id': client_id, 'status': 'completed', 'items': [{'product_id': product_id, 'quantity': 1}],
+    }, headers=headers).get_json()
+    assert order['status'] == 'completed'
+    assert client.delete(f'/products/{deleted_product_id}', headers=headers).status_code == 200
+
+    with app.app_context():
+        assert all(db.session.execute(db.select(db.func.count()).select_from(model)).scalar() for model in USER_RECORDS)
+        db.engine.dispose()
+        event.listen(db.engine, 'connect', lambda connection, record: connection.execute('PRAGMA foreign_keys=ON'))
+
+    assert client.delete(f'/profile/{user_id}', headers=headers).status_code == 200
+
+    with app.app_context():
+        assert db.session.get(Users, user_id) is None
+        for model in USER_RECORDS:
+            assert db.session.execute(db.select(db.func.count()).select_from(model)).scalar() == 0, model.__tablename__
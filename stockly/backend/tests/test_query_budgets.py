@@ -0,0 +1,252 @@
+# query budgets of every route
+#
+# seeds a SQLite database at a small and at a realistic volume (one user with 1k
+# products, 10k orders and 50k order items), calls every route of the app once
+# against each, and counts the SQL statements each call runs; a call fails if it
+# runs more statements on the large database than on the small one (an N+1
+# pattern) or exceeds its budget below, and every route needs a call
+import pytest
+from datetime import datetime, timezone
+from sqlalchemy import event
+from app.backfill import backfill_order_items
+from app.extensions import db
+from app.models import Products, Clients, Orders, OrderItems, MonthlyRevenue
+from app.sales import rebuild_sales_rollups
+from app.search import rebuild_search_index
+from app.stats import reconcile_user_stats
+from support import clear_caches, make_app, register
+
+VOLUMES = {
+    'small': {'products': 10, 'orders': 100, 'items_per_order': 5},
+    'large': {'products': 1000, 'orders': 10000, 'items_per_order': 5},
+}
+
+CLIENTS = 100
+
+# sync token (microseconds since the epoch) of midnight today, so the delta sync
+# call has the same path in both runs
+SYNC_SINCE = int(datetime.combine(datetime.now(timezone.utc).date(), datetime.min.time(), timezone.utc).timestamp()) * 1000000
+
+# (method, path, JSON body or None, expected status, most SQL statements allowed);
+# calls run in order against the seeded data, so the writes come after the reads
+# and only touch rows no earlier call depends on
+CALLS = [
+    ('GET', '/', None, 200, 3),
+    ('GET', '/profile', None, 200, 1),
+    ('GET', '/clients', None, 200, 3),
+    ('GET', '/clients?limit=50', None, 200, 3),
+    ('GET', '/clients/details/1', None, 200, 2),
+    ('GET', '/clients/search?q=client', None, 200, 4),
+    ('GET', '/products', None, 200, 3),
+    ('GET', '/products?limit=50&low_stock=1000000', None, 200, 3),
+    ('GET', '/products/details/1', None, 200, 2),
+    ('GET', '/products/search?q=product', None, 200, 4),
+    ('GET', '/products/export?format=ndjson', None, 200, 2),
+    ('GET', '/products/restock?all=1', None, 200, 4),
+    ('GET', '/orders', None, 200, 4),
+    ('GET', '/orders?limit=50&status=pending', None, 200, 4),
+    ('GET', '/orders/details/1', None, 200, 2),
+    ('GET', '/orders/1/print', None, 200, 3),
+    ('GET', '/analytics/revenue?granularity=week', None, 200, 3),
+    ('GET', '/analytics/top-products?by=revenue', None, 200, 3),
+    ('GET', '/analytics/top-clients?limit=20', None, 200, 3),
+    ('GET', '/sync', None, 200, 6),
+    ('GET', f'/sync?since={SYNC_SINCE}', None, 200, 7),
+    ('GET', '/events', None, 200, 1),
+    ('POST', '/events/token', None, 200, 1),
+    ('GET', '/metrics', None, 200, 0),
+    ('POST', '/clients/register-client', {'name': 'New client', 'phone_number': '555', 'email': 'new@example.com'}, 201, 6),
+    ('PUT', '/clients/details/2', {'name': 'Renamed client'}, 200, 7),
+    ('POST', '/products/register-product', {
+        'name': 'New product', 'color': 'red', 'size': 'M', 'dimensions': '', 'price': 9.5,
+        'description': '', 'quantity': 10,
+    }, 201, 6),
+    ('PUT', '/products/details/2', {'name': 'Renamed product', 'quantity': 999}, 200, 8),
+    ('POST', '/orders/new-order', {'client_id': 1, 'status': 'pending', 'items': [
+        {'product_id': 1, 'quantity': 1}, {'product_id': 2, 'quantity': 2},
+    ]}, 201, 18),
+    ('POST', '/orders/bulk', {'orders': [
+        {'client_id': 1, 'status': 'pending', 'items': [{'product_id': 3, 'quantity': 1}]},
+        {'client_id': 2, 'status': 'completed', 'items': [{'product_id': 4, 'quantity': 1}, {'product_id': 5, 'quantity': 1}]},
+    ]}, 201, 21),
+    ('PUT', '/orders/details/1', {'client_id': 1, 'items': [{'product_id': 1, 'quantity': 1}, {'product_id': 6, 'quantity': 3}]}, 200, 18),
+    # order 3 is completed, so its revenue and sales are reversed and booked again
+    ('PUT', '/orders/details/3', {'client_id': 1, 'items': [{'product_id': 1, 'quantity': 1}, {'product_id': 6, 'quantity': 3}]}, 200, 40),
+    ('PUT', '/orders/4/status', {'status': 'completed'}, 200, 17),
+    ('DELETE', '/orders/5', None, 200, 15),
+    ('DELETE', '/products/7', None, 200, 10),
+    ('DELETE', '/clients/3', None, 200, 9),
+    ('PUT', '/edit-profile', {'name': 'Renamed user', 'email': 'bench@example.com'}, 200, 6),
+    ('POST', '/register', {'name': 'Other', 'email': 'other@example.com', 'password': 'bench', 'confirm_password': 'bench'}, 201, 4),
+    ('POST', '/login', {'email': 'other@example.com', 'password': 'bench'}, 200, 1),
+]
+
+# routes exercised through a body that is not JSON
+IMPORT_CALL = ('POST', '/products/import?format=csv', 200, 10)
+
+# the account deletion runs last, with the token of the user registered above
+DELETE_USER_CALL = ('DELETE', '/profile/{user_id}', 200, 19)
+
+# seeds one user's clients, products, orders and their rollups, all through bulk
+# inserts and the maintenance commands; without 'backfill' the order lines keep
+# reading their details from their products, as lines written before the copy do
+def seed(volume, backfill=True):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    db.session.execute(db.insert(Clients), [
+        {'user_id': 1, 'name': f'Client {number}', 'phone_number': f'555{number:04}', 'email': f'client{number}@example.com'}
+        for number in range(1, CLIENTS + 1)
+    ])
+    db.session.execute(db.insert(Products), [
+        {'user_id': 1, 'name': f'Product {number}', 'color': 'blue', 'size': 'M', 'dimensions': '', 'price': 10.0,
+         'description': 'Seeded product', 'quantity': 1000}
+        for number in range(1, volume['products'] + 1)
+    ])
+    db.session.execute(db.insert(Orders), [
+        {'user_id': 1, 'client_id': number % CLIENTS + 1, 'date': now,
+         'status': 'completed' if number % 3 == 0 else 'pending', 'total_price': 10.0 * volume['items_per_order']}
+        for number in range(1, volume['orders'] + 1)
+    ])
+    db.session.execute(db.insert(OrderItems), [
+        {'user_id': 1, 'order_id': order_id, 'product_id': (order_id + index) % volume['products'] + 1, 'quantity': 1}
+        for order_id in range(1, volume['orders'] + 1)
+        for index in range(volume['items_per_order'])
+    ])
+    db.session.execute(db.insert(MonthlyRevenue), [
+        {'user_id': 1, 'year': now.year, 'month': month, 'revenue': 100} for month in range(1, 13)
+    ])
+    reconcile_user_stats()
+    rebuild_search_index()
+    db.session.commit()
+    if backfill:
+        backfill_order_items()
+    rebuild_sales_rollups()
+    db.session.commit()
+
+# CSV body of the import call: new products and an update of an existing one
+IMPORT_CSV = 'product_id,name,color,size,dimensions,price,description,quantity\n' + ''.join(
+    f',Imported {number},green,L,,5,,3\n' for number in range(10)
+) + '1,Product 1,blue,M,,10,,1000\n'
+
+# makes an app on a freshly seeded database of the given volume, returning it
+# with the headers of its user
+@pytest.fixture(scope='module')
+def seeded_app(tmp_path_factory):
+    apps = []
+
+    def make(volume, backfill=True):
+        app = make_app(tmp_path_factory.mktemp('budget') / 'budget.db')
+        apps.append(app)
+        _, headers = register(app.test_client(), 'bench@example.com')
+        with app.app_context():
+            seed(volume, backfill)
+        return app, headers
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.engine.dispose()
+
+# returns a function making a call against the app, returning its status and
+# statement count
+def caller(app):
+    client = app.test_client()
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(1))
+
+    def call(method, path, headers, **kwargs):
+        # every call starts cold, so the counts include cache misses
+        clear_caches()
+        statements.clear()
+        response = client.open(path, method=method, headers=headers, **kwargs)
+        response.get_data() # streamed responses run their queries while being read
+        return response.status_code, len(statements)
+    return call
+
+# makes every call in order against a seeded database, returning the status and
+# statement count of each by 'METHOD path'
+def run_calls(app, headers):
+    client = app.test_client()
+    call = caller(app)
+
+    results = {}
+    for method, path, body, _, _ in CALLS:
+        results[f'{method} {path}'] = call(method, path, headers, json=body)
+
+    method, path, _, _ = IMPORT_CALL
+    results[f'{method} {path}'] = call(method, path, headers, data=IMPORT_CSV)
+
+    other = client.post('/login', json={'email': 'other@example.com', 'password': 'bench'}).get_json()
+    method, path, _, _ = DELETE_USER_CALL
+    results[f'{method} {path}'] = call(
+        method, path.format(user_id=other['user_id']), {'Authorization': f"Bearer {other['access_token']}"},
+    )
+    return results
+
+# results of the calls at each volume, and the app of the large one
+@pytest.fixture(scope='module')
+def measured(seeded_app):
+    results = {}
+    for name, volume in VOLUMES.items():
+        app, headers = seeded_app(volume)
+        results[name] = run_calls(app, headers)
+    return app, results
+
+BUDGETS = {
+    **{f'{method} {path}': (status, budget) for method, path, _, status, budget in CALLS},
+    f'{IMPORT_CALL[0]} {IMPORT_CALL[1]}': IMPORT_CALL[2:],
+    f'{DELETE_USER_CALL[0]} {DELETE_USER_CALL[1]}': DELETE_USER_CALL[2:],
+}
+
+@pytest.mark.parametrize('call', list(BUDGETS))
+def test_call_within_budget(measured, call):
+    _, results = measured
+    status, budget = BUDGETS[call]
+    assert [results[volume][call][0] for volume in VOLUMES] == [status] * len(VOLUMES)
+    assert results['large'][call][1] <= budget
+
+# more statements on the large database than on the small one is an N+1 pattern
+@pytest.mark.parametrize('call', list(BUDGETS))
+def test_statements_do_not_grow_with_data(measured, call):
+    _, results = measured
+    assert results['large'][call][1] <= results['small'][call][1]
+
+# the reads of order lines, made against lines that were never backfilled
+UNBACKFILLED_CALLS = [
+    f'{method} {path}' for method, path, _, _, _ in CALLS
+    if method == 'GET' and path.startswith(('/orders', '/sync'))
+]
+
+# results of the order line reads at each volume, without the backfill
+@pytest.fixture(scope='module')
+def measured_unbackfilled(seeded_app):
+    results = {}
+    for name, volume in VOLUMES.items():
+        app, headers = seeded_app(volume, backfill=False)
+        call = caller(app)
+        results[name] = {key: call(*key.split(' ', 1), headers) for key in UNBACKFILLED_CALLS}
+    return results
+
+# lines without their own details load their products in one more statement,
+# however many lines there are
+@pytest.mark.parametrize('call', UNBACKFILLED_CALLS)
+def test_unbackfilled_lines_within_budget(measured_unbackfilled, call):
+    status, budget = BUDGETS[call]
+    assert [measured_unbackfilled[volume][call][0] for volume in VOLUMES] == [status] * len(VOLUMES)
+    assert measured_unbackfilled['large'][call][1] <= measured_unbackfilled['small'][call][1]
+    assert measured_unbackfilled['large'][call][1] <= budget + 1
+
+def test_every_route_has_a_call(measured):
+    app, results = measured
+    uncovered = {
+        (rule.endpoint, method)
+        for rule in app.url_map.iter_rules()
+        for method in rule.methods - {'HEAD', 'OPTIONS'}
+        if rule.endpoint != 'static'
+    }
+    adapter = app.url_map.bind('localhost')
+    for key in results['large']:
+        method, path = key.split(' ', 1)
+        endpoint, _ = adapter.match(path.format(user_id=1).split('?')[0], method=method)
+        uncovered.discard((endpoint, method))
+    assert not uncovered
@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from app.extensions import db
+from app.models import Products, Clients, Orders, OrderItems, MonthlyRevenue, RevenueEvents, DailyRevenue, MonthlyProductSales
+from app.stats import reconcile_user_stats
+from support import register
+
+ORDERS_PER_USER = 250
+ATTEMPTS_PER_ORDER = 2
+
+# adds pending orders of one line each for a user, priced 1.0 to ORDERS_PER_USER
+def seed_orders(user_id):
+    product_id = db.session.execute(db.insert(Products).values(
+        user_id=user_id, name='Product', price=1.0, quantity=1000000,
+    )).inserted_primary_key[0]
+    client_id = db.session.execute(db.insert(Clients).values(user_id=user_id, name='Client')).inserted_primary_key[0]
+
+    first = db.session.execute(db.select(db.func.coalesce(db.func.max(Orders.order_id), 0))).scalar() + 1
+    order_ids = list(range(first, first + ORDERS_PER_USER))
+    db.session.execute(db.insert(Orders), [
+        {'order_id': order_id, 'user_id': user_id, 'client_id': client_id, 'date': datetime.utcnow(),
+         'status': 'pending', 'total_price': float(number)}
+        for number, order_id in enumerate(order_ids, 1)
+    ])
+    db.session.execute(db.insert(OrderItems), [
+        {'user_id': user_id, 'order_id': order_id, 'product_id': product_id, 'quantity': number, 'unit_price': 1.0,
+         'product_name': 'Product', 'product_size': None, 'product_color': None}
+        for number, order_id in enumerate(order_ids, 1)
+    ])
+    return order_ids
+
+# two users complete their orders from many threads at once, each order twice;
+# every completed order must be booked exactly once, in its own user's totals
+def test_parallel_completions_book_exact_totals(app):
+    users = {}
+    for email in ('first@example.com', 'second@example.com'):
+        user_id, headers = register(app.test_client(), email)
+        users[user_id] = headers
+    with app.app_context():
+        orders = {user_id: seed_orders(user_id) for user_id in users}
+        reconcile_user_stats()
+        db.session.commit()
+
+    completions = [
+        (user_id, order_id) for user_id, order_ids in orders.items() for order_id in order_ids
+    ] * ATTEMPTS_PER_ORDER
+
+    def complete(completion):
+        user_id, order_id = completion
+        response = app.test_client().put(f'/orders/{order_id}/status', json={'status': 'completed'}, headers=users[user_id])
+        return response.status_code
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        statuses = list(executor.map(complete, completions))
+
+    assert len(statuses) == 1000
+    # the second completion of an order finds it completed (200) or loses the race
+    # (409); completions that waited too long for SQLite's write lock get 503 and
+    # leave their order as it was
+    assert set(statuses) <= {200, 409, 503}
+
+    with app.app_context():
+        for user_id in users:
+            expected, completed = db.session.execute(
+                db.select(db.func.sum(OrderItems.quantity * OrderItems.unit_price), db.func.count())
+                .join(Orders, Orders.order_id == OrderItems.order_id)
+                .where(Orders.user_id == user_id, Orders.status == 'completed')
+            ).one()
+            expected = Decimal(str(expected))
+            assert completed > ORDERS_PER_USER * 0.9
+
+            assert db.session.execute(
+                db.select(db.func.sum(MonthlyRevenue.revenue)).where(MonthlyRevenue.user_id == user_id)
+            ).scalar() == expected
+            assert db.session.execute(
+                db.select(db.func.sum(RevenueEvents.amount), db.func.count()).where(RevenueEvents.user_id == user_id)
+            ).one() == (expected, completed)
+            assert db.session.execute(
+                db.select(db.func.sum(DailyRevenue.revenue), db.func.sum(DailyRevenue.orders)).where(DailyRevenue.user_id == user_id)
+            ).one() == (expected, completed)
+            assert db.session.execute(
+                db.select(db.func.sum(MonthlyProductSales.units)).where(MonthlyProductSales.user_id == user_id)
+            ).scalar() == expected
+
+            dashboard = app.test_client().get('/', headers=users[user_id]).get_json()
+            assert dashboard['currentMonthRevenue'] == float(expected)
+            assert dashboard['pendingOrders'] == ORDERS_PER_USER - completed
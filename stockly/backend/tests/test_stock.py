@@ -0,0 +1,71 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from app.extensions import db
+from app.models import Products, OrderItems
+
+STOCK = 50
+
+def stock_of(app, product_id):
+    with app.app_context():
+        return db.session.get(Products, product_id).quantity
+
+@pytest.mark.parametrize('quantity', [-100, 0, 1.5, True, '2', None])
+def test_order_quantities_must_be_positive_whole_numbers(app, client, headers, catalog, quantity):
+    client_id, (product_id,) = catalog(quantity=STOCK)
+    items = [{'product_id': product_id, 'quantity': quantity}]
+
+    assert client.post('/orders/new-order', json={'client_id': client_id, 'items': items}, headers=headers).status_code == 400
+
+    order = client.post('/orders/new-order', json={
+        'client_id': client_id, 'items': [{'product_id': product_id, 'quantity': 1}],
+    }, headers=headers).get_json()
+    response = client.put(f"/orders/details/{order['order_id']}", json={'items': items}, headers=headers)
+    assert response.status_code == 400
+
+    assert stock_of(app, product_id) == STOCK - 1
+
+# more orders than there are units, placed from many threads at once: exactly
+# the units in stock are sold and the rest are refused
+def test_concurrent_orders_never_oversell(app, headers, catalog):
+    client_id, (product_id,) = catalog(quantity=STOCK)
+
+    def place(_):
+        response = app.test_client().post('/orders/new-order', json={
+            'client_id': client_id, 'items': [{'product_id': product_id, 'quantity': 1}],
+        }, headers=headers)
+        return response.status_code
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        statuses = list(executor.map(place, range(STOCK * 2)))
+
+    assert statuses.count(201) == STOCK
+    assert statuses.count(409) == STOCK
+    assert stock_of(app, product_id) == 0
+    with app.app_context():
+        assert db.session.execute(db.select(db.func.sum(OrderItems.quantity))).scalar() == STOCK
+    assert app.test_client().get('/', headers=headers).get_json()['totalStock'] == 0
+
+# stock edits made while orders are placed never overwrite the units those orders
+# took: an edit that raced an order is refused, and the dashboard's total stock
+# matches the product's
+def test_stock_edits_keep_concurrent_reservations(app, headers, catalog):
+    client_id, (product_id,) = catalog(quantity=STOCK)
+
+    def place(_):
+        return app.test_client().post('/orders/new-order', json={
+            'client_id': client_id, 'items': [{'product_id': product_id, 'quantity': 1}],
+        }, headers=headers).status_code
+
+    def edit(_):
+        return app.test_client().put(f'/products/details/{product_id}', json={'quantity': STOCK}, headers=headers).status_code
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        placed = executor.map(place, range(STOCK))
+        edited = executor.map(edit, range(STOCK))
+        placed, edited = list(placed), list(edited)
+
+    assert placed == [201] * STOCK
+    assert set(edited) <= {200, 409}
+    quantity = stock_of(app, product_id)
+    assert 0 <= quantity <= STOCK
+    assert app.test_client().get('/', headers=headers).get_json()['totalStock'] == quantity
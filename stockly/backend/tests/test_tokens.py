@@ -0,0 +1,18 @@
+import jwt
+from support import clear_caches, register
+
+# a token's signature is checked on its first request only; this also fails if a
+# flask-jwt-extended upgrade stops decoding through the overridden method
+def test_verified_tokens_are_not_decoded_again(client, monkeypatch):
+    _, headers = register(client)
+    clear_caches()
+
+    decoded = []
+    decode = jwt.decode
+    monkeypatch.setattr(jwt, 'decode', lambda *args, **kwargs: decoded.append(1) or decode(*args, **kwargs))
+
+    assert client.get('/profile', headers=headers).status_code == 200
+    first = len(decoded)
+    for _ in range(3):
+        assert client.get('/profile', headers=headers).status_code == 200
+    assert first and len(decoded) == first